@@ -0,0 +1,212 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import os
+import threading
+import time
+import numpy as np
+
+
+HEDGE_ENV_VAR = 'SCRAPER_HEDGE'
+DEFAULT_TIMEOUT = 30
+MIN_TIMEOUT = 10
+MAX_TIMEOUT = 30
+WINDOW = 50
+MIN_SAMPLES = 5
+PERCENTILE = 95
+MULTIPLIER = 2.0
+
+
+class AdaptiveTimeout:
+    """
+    Wait timeout derived from the latencies observed so far.
+
+    The scrapers feed it the time each report table took to appear, the wait
+    the timeout is used for. The timeout is MULTIPLIER times the rolling
+    PERCENTILE of the last WINDOW successful waits, clamped to [MIN_TIMEOUT, MAX_TIMEOUT]. Until
+    MIN_SAMPLES latencies have been seen it stays at DEFAULT_TIMEOUT (the
+    previous fixed value), so it can only ever get tighter than before.
+    """
+
+    def __init__(self, default=DEFAULT_TIMEOUT, min_timeout=MIN_TIMEOUT, max_timeout=MAX_TIMEOUT,
+                 window=WINDOW, min_samples=MIN_SAMPLES, percentile=PERCENTILE, multiplier=MULTIPLIER):
+        self.default = default
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        """
+        Record the latency of a successful wait.
+        """
+        with self.lock:
+            self.samples.append(seconds)
+
+    def observe_failure(self):
+        """
+        Record a wait that timed out.
+
+        The current timeout is recorded as a latency so repeated failures push
+        the timeout back up instead of tightening it further.
+        """
+        self.observe(self.current())
+
+    def expected(self):
+        """
+        Get the rolling percentile latency, or None until enough samples exist.
+        """
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            return float(np.percentile(self.samples, self.percentile))
+
+    def current(self):
+        """
+        Get the timeout to use for the next wait (seconds).
+        """
+        expected = self.expected()
+        if expected is None:
+            return self.default
+        return min(self.max_timeout, max(self.min_timeout, expected * self.multiplier))
+
+
+class HedgedRunner:
+    """
+    Run jobs on a primary browser and re-issue slow ones on a spare.
+
+    When a job runs longer than its expected latency (the rolling percentile
+    of earlier jobs' run times), the same job is started on a second driver
+    and the first non-empty result wins. The deadline starts once the driver
+    is in the job's form state, so loading the page for a new state does not
+    count as slow. Selenium calls cannot be cancelled, so the
+    losing driver finishes in the background and is not reused until it is
+    done; the winner keeps serving the next jobs.
+    """
+
+    def __init__(self, make_driver, prepare, run, get_state, timeouts, spares=1):
+        """
+        Args:
+            make_driver: Callable returning a new WebDriver
+            prepare: Callable(driver, job) that puts a driver's page in the job's form state
+            run: Callable(driver, job, wait_timeout) returning the job's rows
+            get_state: Callable(job) returning the job's form state
+            timeouts: AdaptiveTimeout providing wait_timeout, shared by all drivers
+            spares: Number of spare drivers
+        """
+        self.make_driver = make_driver
+        self.prepare = prepare
+        self.run_job = run
+        self.get_state = get_state
+        self.timeouts = timeouts
+        # Run times of whole jobs, excluding prepare(); only used for the hedge deadline
+        self.latencies = AdaptiveTimeout()
+        self.max_drivers = 1 + spares
+        self.slots = []
+        self.executor = ThreadPoolExecutor(max_workers=self.max_drivers)
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _get_idle_slot(self, job, exclude=()):
+        idle = [slot for slot in self.slots
+                if slot not in exclude and (slot['future'] is None or slot['future'].done())]
+        # Prefer a driver that is already in the job's form state
+        for slot in idle:
+            if slot['state'] == self.get_state(job):
+                return slot
+        if idle:
+            return idle[0]
+        if len(self.slots) < self.max_drivers:
+            slot = {'driver': None, 'state': None, 'future': None}
+            self.slots.append(slot)
+            return slot
+        return None
+
+    def _execute(self, slot, job, prepared=None):
+        try:
+            try:
+                if slot['driver'] is None:
+                    slot['driver'] = self.make_driver()
+                if slot['state'] != self.get_state(job):
+                    self.prepare(slot['driver'], job)
+                    slot['state'] = self.get_state(job)
+            finally:
+                if prepared:
+                    prepared.set()
+            start = time.perf_counter()
+            rows = self.run_job(slot['driver'], job, self.timeouts.current())
+            return rows, time.perf_counter() - start
+        except Exception:
+            # Start this driver from a fresh page next time
+            slot['state'] = None
+            raise
+
+    def _submit(self, slot, job, prepared=None):
+        slot['future'] = self.executor.submit(self._execute, slot, job, prepared)
+        return slot['future']
+
+    def run(self, job):
+        """
+        Run a job, hedging it on a spare driver if it is slower than expected.
+
+        Returns:
+            list: Rows from the first attempt that returned data (empty if none did)
+        """
+        primary = self._get_idle_slot(job)
+        if primary is None:
+            # Every driver is still finishing a hedged job; wait for one
+            wait([slot['future'] for slot in self.slots], return_when=FIRST_COMPLETED)
+            primary = self._get_idle_slot(job)
+
+        prepared = threading.Event()
+        futures = {self._submit(primary, job, prepared): primary}
+        # The deadline only covers the job itself, not a page load for a new state
+        prepared.wait()
+        expected = self.latencies.expected()
+        done, _ = wait(futures, timeout=expected)
+
+        if not done:
+            spare = self._get_idle_slot(job, exclude=[primary])
+            if spare is not None:
+                self.hedged += 1
+                print(f"  Slower than expected ({expected:.1f}s), hedging on a spare browser...")
+                futures[self._submit(spare, job)] = spare
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    rows, elapsed = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if rows:
+                    self.latencies.observe(elapsed)
+                    if futures[future] is not primary:
+                        self.hedge_wins += 1
+                    return rows
+
+        self.latencies.observe_failure()
+        if error is not None:
+            raise error
+        return []
+
+    def close(self):
+        """
+        Wait for background attempts to finish and quit every driver.
+        """
+        self.executor.shutdown(wait=True)
+        for slot in self.slots:
+            if slot['driver'] is not None:
+                slot['driver'].quit()
+
+
+def hedging_enabled():
+    """
+    Check the SCRAPER_HEDGE environment variable.
+    """
+    return os.environ.get(HEDGE_ENV_VAR, '').lower() in ['1', 'true', 'yes']
@@ -0,0 +1,81 @@
+import os
+
+
+def get_child_pids(pid):
+    """
+    Get the direct children of a process (Linux only).
+
+    Args:
+        pid: Process id
+
+    Returns:
+        list: Child process ids
+    """
+    children = []
+    task_dir = f'/proc/{pid}/task'
+    try:
+        for tid in os.listdir(task_dir):
+            with open(os.path.join(task_dir, tid, 'children')) as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def get_rss(pid):
+    """
+    Get the resident set size of one process in bytes (Linux only).
+
+    Returns:
+        int: RSS in bytes, or 0 if the process is gone
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def get_process_tree_rss(pid):
+    """
+    Sum the RSS of a process and all of its descendants.
+
+    Args:
+        pid: Root process id
+
+    Returns:
+        int: Total RSS in bytes, or None where /proc is not available
+    """
+    if not os.path.exists('/proc/self/status'):
+        return None
+    total = 0
+    pending = [pid]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        total += get_rss(current)
+        pending.extend(get_child_pids(current))
+    return total
+
+
+def get_driver_rss(driver):
+    """
+    Get the memory used by a WebDriver's chromedriver and browser processes.
+
+    Args:
+        driver: Selenium WebDriver instance
+
+    Returns:
+        int: Total RSS in bytes, or None if it cannot be measured
+    """
+    try:
+        pid = driver.service.process.pid
+    except AttributeError:
+        return None
+    return get_process_tree_rss(pid)
@@ -0,0 +1,149 @@
+from collections import deque
+import os
+import statistics
+from selenium import webdriver
+
+from browser_memory import get_driver_rss
+
+
+# Thresholds, each overridable with an environment variable (0 disables a check)
+MAX_RSS_MB = 1500
+MAX_DRIFT = 1.5
+MAX_COMBINATIONS = 0
+# Latencies used for a fresh browser's baseline and for the recent median
+WINDOW = 5
+# Never restart more often than this, so a slow server does not cause churn
+MIN_COMBINATIONS = 10
+
+
+class BrowserRecycler:
+    """
+    Decide when a long-running browser should be replaced by a fresh one.
+
+    A browser is recycled when its process tree (chromedriver and Chrome)
+    exceeds max_rss_mb, when the median of its last `window` combination
+    latencies exceeds max_drift times the median of its first `window`, or
+    after max_combinations combinations. The baseline is re-measured after
+    every restart, so a server that is slow for everyone does not trigger
+    repeated restarts.
+    """
+
+    def __init__(self, max_rss_mb=MAX_RSS_MB, max_drift=MAX_DRIFT, max_combinations=MAX_COMBINATIONS,
+                 window=WINDOW, min_combinations=MIN_COMBINATIONS):
+        self.max_rss_mb = max_rss_mb
+        self.max_drift = max_drift
+        self.max_combinations = max_combinations
+        self.window = window
+        self.min_combinations = min_combinations
+        self.restarts = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Start tracking a fresh browser.
+        """
+        self.combinations = 0
+        self.baseline = []
+        self.recent = deque(maxlen=self.window)
+
+    def observe(self, seconds):
+        """
+        Record the latency of a successful combination.
+        """
+        if len(self.baseline) < self.window:
+            self.baseline.append(seconds)
+        else:
+            self.recent.append(seconds)
+
+    def check(self, driver):
+        """
+        Check whether the browser should be recycled before the next combination.
+
+        Args:
+            driver: Selenium WebDriver instance
+
+        Returns:
+            str: Reason for recycling, or None to keep the browser
+        """
+        self.combinations += 1
+        if self.combinations <= self.min_combinations:
+            return None
+
+        if self.max_combinations and self.combinations > self.max_combinations:
+            return f"{self.combinations - 1} combinations since start"
+
+        if self.max_rss_mb:
+            rss = get_driver_rss(driver)
+            if rss is not None and rss > self.max_rss_mb * 1e6:
+                return f"browser memory {rss / 1e6:.0f} MB > {self.max_rss_mb} MB"
+
+        if self.max_drift and len(self.recent) == self.window:
+            baseline = statistics.median(self.baseline)
+            recent = statistics.median(self.recent)
+            if recent > baseline * self.max_drift:
+                return f"median latency {recent:.1f}s vs {baseline:.1f}s when fresh"
+
+        return None
+
+    def recycle(self, driver, restore, tracer=None):
+        """
+        Quit a browser and start a new one in the same form state.
+
+        The new browser is launched before the old one is quit, so if the
+        launch fails the old browser is kept and retried after another
+        min_combinations combinations.
+
+        Args:
+            driver: WebDriver to replace
+            restore: Callable(driver) that restores the form state, e.g. load_page_state
+            tracer: Active CommandTracer to move to the new driver
+
+        Returns:
+            WebDriver: The new driver, or the old one if no new browser could be started
+        """
+        try:
+            new_driver = webdriver.Chrome()
+        except Exception as e:
+            print(f"  Warning: Could not start a new browser, keeping the old one: {e}")
+            self.reset()
+            return driver
+
+        if tracer:
+            tracer.uninstall()
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"  Warning: Could not quit old browser: {e}")
+
+        driver = new_driver
+        if tracer:
+            tracer.driver = driver
+            tracer.install()
+        self.restarts += 1
+        self.reset()
+        try:
+            restore(driver)
+        except Exception as e:
+            # handle_subgroup() reloads the page on its retries
+            print(f"  Warning: Could not restore form state: {e}")
+        return driver
+
+
+def get_recycler():
+    """
+    Build a BrowserRecycler from the environment.
+
+    SCRAPER_RECYCLE_RSS_MB, SCRAPER_RECYCLE_DRIFT and SCRAPER_RECYCLE_EVERY
+    override the memory, latency drift and combination count thresholds;
+    SCRAPER_RECYCLE=0 turns recycling off.
+
+    Returns:
+        BrowserRecycler: Configured policy, or None if recycling is disabled
+    """
+    if os.environ.get('SCRAPER_RECYCLE', '').lower() in ['0', 'false', 'no', 'off']:
+        return None
+    return BrowserRecycler(
+        max_rss_mb=float(os.environ.get('SCRAPER_RECYCLE_RSS_MB', MAX_RSS_MB)),
+        max_drift=float(os.environ.get('SCRAPER_RECYCLE_DRIFT', MAX_DRIFT)),
+        max_combinations=int(os.environ.get('SCRAPER_RECYCLE_EVERY', MAX_COMBINATIONS))
+    )
@@ -0,0 +1,395 @@
+import os
+import sys
+import time
+import pandas as pd
+
+import enrollment_scraper
+import graduation_rate_scraper
+from data_cleaning import find_output_files, parse_output_filename, process_file, read_raw
+from normalized_output import get_output_mode, save_output
+
+
+STATE_TOTAL_CODE = '00000000'
+AUDIT_FILENAME = 'MA_completeness_report.csv'
+# District entity counts add up exactly to the State Total row in the
+# enrollment report; allow a little slack for rounding or late corrections
+STATE_TOTAL_TOLERANCE = 0.02
+REPAIR_STATUSES = ['missing', 'short']
+# A slice is short when it covers less than this share of the entities its
+# breakdown typically covers in other slices (coverage of a breakdown is
+# stable across years and periods, e.g. White ~0.95, Asian ~0.8)
+COVERAGE_FLOOR = 0.4
+# Slices of the same breakdown needed before a typical coverage is trusted
+MIN_REFERENCE_SLICES = 2
+# The other report only vouches for breakdowns it reports for nearly every
+# entity; small subgroups are suppressed differently in each report
+UNIVERSAL_COVERAGE = 0.8
+
+
+def get_expected_slices(report, year):
+    """
+    List the (capture_period, breakdown) slices a complete file should contain.
+
+    Args:
+        report: 'enrollment' or 'graduation'
+        year: Output year (e.g., 2024)
+
+    Returns:
+        list: (capture_period, breakdown) tuples in scrape order; capture_period is '' for graduation rates
+    """
+    if report == 'enrollment':
+        periods = [enrollment_scraper.get_capture_period(value) for value in enrollment_scraper.ATTEND_RANGE_DROPDOWN_VALUES]
+        return [(period, name) for period in periods for name in enrollment_scraper.SUBGROUP_DROPDOWN_VALUES.values()]
+    return [('', name) for name in graduation_rate_scraper.DROPDOWN_VALUES.values()]
+
+
+def get_slice_coverage(path):
+    """
+    Measure which share of a file's entities each slice covers.
+
+    An entity counts towards a capture period if any breakdown reports it.
+
+    Returns:
+        DataFrame: file, report, data_type, capture_period, breakdown, coverage
+    """
+    report, data_type, _ = parse_output_filename(path)
+    raw = read_raw(path)
+    raw = raw[raw['entity_code'] != STATE_TOTAL_CODE]
+    periods = raw['capture_period'] if report == 'enrollment' else pd.Series('', index=raw.index)
+    raw = raw.assign(capture_period=periods)
+    union = raw.groupby('capture_period')['entity_code'].nunique()
+    coverage = raw.groupby(['capture_period', 'breakdown'])['entity_code'].nunique().reset_index(name='entities')
+    coverage['coverage'] = coverage['entities'] / coverage['capture_period'].map(union)
+    coverage.insert(0, 'data_type', data_type)
+    coverage.insert(0, 'report', report)
+    coverage.insert(0, 'file', os.path.basename(path))
+    return coverage.drop(columns='entities')
+
+
+def get_typical_coverage(coverage, file, report, data_type, period, breakdown):
+    """
+    Get the median coverage of a breakdown in the other slices.
+
+    Slices of the same report and data type are preferred; with too few of
+    them (graduation rates have a single year and period) the other data
+    type is used as well. The other report is used last, and only for
+    breakdowns it reports for nearly every entity (e.g. White, Female).
+
+    Returns:
+        float: Typical coverage, or None without enough evidence
+    """
+    if coverage is None or coverage.empty:
+        return None
+    others = coverage[(coverage['breakdown'] == breakdown)
+                      & ~((coverage['file'] == file) & (coverage['capture_period'] == period))]
+    tiers = [
+        (others['report'] == report) & (others['data_type'] == data_type),
+        others['report'] == report
+    ]
+    for tier in tiers:
+        pool = others.loc[tier, 'coverage']
+        if len(pool) >= MIN_REFERENCE_SLICES:
+            return float(pool.median())
+    pool = others['coverage']
+    if len(pool) >= MIN_REFERENCE_SLICES and pool.median() >= UNIVERSAL_COVERAGE:
+        return float(pool.median())
+    return None
+
+
+def audit_file(path, sibling_breakdowns=(), coverage=None):
+    """
+    Compare each slice of an output file against the entities it should contain.
+
+    A slice is one (capture_period, breakdown) for enrollment files and one
+    breakdown for graduation rate files. Its expected entities are the ones
+    reported for the same breakdown in the other capture periods, plus the
+    State Total row where the file has one. Enrollment slices with a State
+    Total are also checked by summing the entities' graduate counts. Every
+    slice is also compared with the other subgroups: it is short when it
+    covers far fewer of the entities reported in its capture period than its
+    breakdown typically does (see get_typical_coverage()). This is the only
+    check that applies to graduation rate files, which have one period and
+    no State Total row.
+
+    Statuses:
+      - ok: nothing indicates a gap
+      - short: rows are missing compared with the evidence above
+      - missing: no rows, although the breakdown or capture period has data elsewhere
+      - unpublished: no rows, and the whole capture period is empty (not released yet)
+      - unavailable: no rows for this breakdown in any capture period of this file
+        or of the other data type for the same year
+
+    Args:
+        path: Path to a scraper output CSV
+        sibling_breakdowns: Breakdowns found in the other data type's file for the same year
+        coverage: Slice coverage of all audited files, from get_slice_coverage()
+
+    Returns:
+        DataFrame: One row per expected slice
+    """
+    report, data_type, year = parse_output_filename(path)
+    _, df, _ = process_file(path)
+    if report == 'graduation':
+        df['capture_period'] = ''
+        count_column = '# in Cohort'
+    else:
+        df['capture_period'] = df['capture_period'].astype(str)
+        count_column = 'High School Graduates (#)'
+    df['breakdown'] = df['breakdown'].astype(str)
+
+    is_state = df['entity_code'] == STATE_TOTAL_CODE
+    has_state_totals = bool(is_state.any())
+    populated_periods = set(df['capture_period'])
+    populated_breakdowns = set(df['breakdown'])
+    entities = df[~is_state].groupby(['capture_period', 'breakdown'])['entity_code'].agg(set).to_dict()
+    state_counts = df[is_state].set_index(['capture_period', 'breakdown'])[count_column].to_dict()
+    entity_sums = df[~is_state].groupby(['capture_period', 'breakdown'])[count_column].sum().to_dict()
+    rows = df.groupby(['capture_period', 'breakdown']).size().to_dict()
+    period_entities = df[~is_state].groupby('capture_period')['entity_code'].nunique().to_dict()
+
+    records = []
+    for period, breakdown in get_expected_slices(report, year):
+        found = entities.get((period, breakdown), set())
+        # Entities reported for the same breakdown in the other capture periods
+        others = set()
+        for (other_period, other_breakdown), codes in entities.items():
+            if other_breakdown == breakdown and other_period != period:
+                others |= codes
+        expected = found | others
+        missing_entities = expected - found
+        state_present = (period, breakdown) in state_counts
+        state_count = state_counts.get((period, breakdown))
+        entity_sum = entity_sums.get((period, breakdown))
+        row_count = rows.get((period, breakdown), 0)
+        union = period_entities.get(period, 0)
+        slice_coverage = len(found) / union if union else None
+        typical = get_typical_coverage(coverage, os.path.basename(path), report, data_type, period, breakdown)
+        too_narrow = slice_coverage is not None and typical is not None and slice_coverage < typical * COVERAGE_FLOOR
+
+        if row_count == 0:
+            if breakdown in populated_breakdowns or breakdown in sibling_breakdowns:
+                status = 'unpublished' if period not in populated_periods else 'missing'
+            else:
+                status = 'unavailable'
+        elif missing_entities or (has_state_totals and not state_present) or too_narrow:
+            status = 'short'
+        elif (report == 'enrollment' and state_present and state_count
+              and entity_sum < state_count * (1 - STATE_TOTAL_TOLERANCE)):
+            status = 'short'
+        else:
+            status = 'ok'
+
+        expected_rows = len(expected) + (1 if has_state_totals else 0) if expected else None
+        if too_narrow:
+            # Estimate from the coverage this breakdown usually has
+            estimate = round(typical * union) + (1 if has_state_totals else 0)
+            expected_rows = max(expected_rows or 0, estimate)
+
+        records.append({
+            'file': os.path.basename(path),
+            'report': report,
+            'data_type': data_type,
+            'year': year,
+            'capture_period': period,
+            'breakdown': breakdown,
+            'rows': row_count,
+            # Unknown when neither another capture period nor the other subgroups give evidence
+            'expected_rows': expected_rows,
+            'missing_entities': len(missing_entities),
+            'coverage': round(slice_coverage, 3) if slice_coverage is not None else None,
+            'typical_coverage': round(typical, 3) if typical is not None else None,
+            'state_total': state_count,
+            'entity_sum': entity_sum,
+            'status': status
+        })
+    return pd.DataFrame(records)
+
+
+def audit(directory='.'):
+    """
+    Audit every scraper output file in a directory.
+
+    Returns:
+        DataFrame: Slice-level results from audit_file() for all files
+    """
+    paths = find_output_files(directory)
+    breakdowns = {}
+    for path in paths:
+        report, data_type, year = parse_output_filename(path)
+        breakdowns[(report, data_type, year)] = set(read_raw(path)['breakdown'])
+    coverage = pd.concat([get_slice_coverage(path) for path in paths], ignore_index=True) if paths else None
+
+    results = []
+    for path in paths:
+        report, data_type, year = parse_output_filename(path)
+        sibling = set()
+        for other_type in ['school', 'district']:
+            if other_type != data_type:
+                sibling |= breakdowns.get((report, other_type, year), set())
+        results.append(audit_file(path, sibling, coverage))
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, ignore_index=True)
+
+
+def get_slice_job(record):
+    """
+    Translate an audit record back to the dropdown values the scraper needs.
+
+    Returns:
+        dict: report, data_type, year, attend_range and subgroup, as used by the work queue
+    """
+    if record['report'] == 'enrollment':
+        subgroups = {name: value for value, name in enrollment_scraper.SUBGROUP_DROPDOWN_VALUES.items()}
+        attend_ranges = {enrollment_scraper.get_capture_period(value): value
+                         for value in enrollment_scraper.ATTEND_RANGE_DROPDOWN_VALUES}
+        years = {enrollment_scraper.map_year(year): year for year in enrollment_scraper.YEAR_DROPDOWN_VALUES.values()}
+        return {
+            'report': 'enrollment',
+            'data_type': record['data_type'],
+            'year': years[str(record['year'])],
+            'attend_range': attend_ranges[record['capture_period']],
+            'subgroup': subgroups[record['breakdown']]
+        }
+    subgroups = {name: value for value, name in graduation_rate_scraper.DROPDOWN_VALUES.items()}
+    return {
+        'report': 'graduation',
+        'data_type': record['data_type'],
+        'year': '',
+        'attend_range': '',
+        'subgroup': subgroups[record['breakdown']]
+    }
+
+
+def merge_slice(path, record, data):
+    """
+    Replace one slice of an output file with freshly scraped rows, in place.
+
+    Rows are kept in scrape order (capture period, then subgroup). The file
+    is only rewritten if the new slice has at least as many rows as the old.
+    With SCRAPER_OUTPUT=normalized or both, the fact table is rewritten too.
+
+    Returns:
+        bool: True if the file was updated
+    """
+    report = record['report']
+    raw = read_raw(path)
+    if report == 'enrollment':
+        in_slice = (raw['capture_period'] == record['capture_period']) & (raw['breakdown'] == record['breakdown'])
+    else:
+        in_slice = raw['breakdown'] == record['breakdown']
+
+    if len(data) < int(in_slice.sum()):
+        print(f"  Keeping existing {int(in_slice.sum())} rows; re-scrape returned only {len(data)}")
+        return False
+
+    new_rows = pd.DataFrame(data, columns=raw.columns).fillna('')
+    merged = pd.concat([raw[~in_slice], new_rows], ignore_index=True)
+
+    order = {slice_key: idx for idx, slice_key in enumerate(get_expected_slices(report, record['year']))}
+    periods = merged['capture_period'] if report == 'enrollment' else pd.Series('', index=merged.index)
+    slice_order = [order.get(key, len(order)) for key in zip(periods, merged['breakdown'])]
+    merged = merged.assign(_order=slice_order).sort_values('_order', kind='stable').drop(columns='_order')
+
+    # The audit reads the flat file, so it is kept even in normalized mode
+    save_output(merged, path, 'flat' if get_output_mode() == 'flat' else 'both')
+    return True
+
+
+def repair(directory='.', statuses=REPAIR_STATUSES):
+    """
+    Re-scrape the slices the audit flagged and merge them into their files.
+
+    Args:
+        directory: Directory containing the scraper outputs
+        statuses: Audit statuses to repair
+
+    Returns:
+        DataFrame: The repaired slices with a 'repaired' column
+    """
+    from selenium import webdriver
+    from work_queue import prepare_page, run_job, get_job_state
+    from table_script import get_extraction_mode
+    from snapshot_archive import get_archive
+
+    results = audit(directory)
+    todo = results[results['status'].isin(statuses)].copy()
+    if todo.empty:
+        print("Nothing to repair.")
+        return todo
+
+    print(f"Repairing {len(todo)} slices...")
+    extraction = get_extraction_mode()
+    archive = get_archive()
+    driver = webdriver.Chrome()
+    state = None
+    repaired = []
+    try:
+        for idx, record in enumerate(todo.to_dict('records'), 1):
+            job = get_slice_job(record)
+            label = f"{record['file']} {record['capture_period']} {record['breakdown']}".replace('  ', ' ')
+            print(f"\n[{idx}/{len(todo)}] Re-scraping {label} ({record['status']}, {record['rows']}/{record['expected_rows']} rows)")
+            try:
+                if get_job_state(job) != state:
+                    prepare_page(driver, job)
+                    state = get_job_state(job)
+                data = run_job(driver, job, extraction, archive)
+            except Exception as e:
+                print(f"✗ Error re-scraping {label}: {e}")
+                state = None
+                repaired.append(False)
+                continue
+
+            if data and merge_slice(os.path.join(directory, record['file']), record, data):
+                print(f"✓ Merged {len(data)} rows into {record['file']}")
+                repaired.append(True)
+            else:
+                print(f"✗ Could not repair {label}")
+                repaired.append(False)
+
+            # Small delay between requests to avoid overwhelming the server
+            time.sleep(2)
+    finally:
+        print("\nClosing browser...")
+        driver.quit()
+
+    todo['repaired'] = repaired
+    return todo
+
+
+def main():
+    """
+    Audit output files for short or missing slices, and optionally repair them.
+    """
+    if len(sys.argv) < 2 or sys.argv[1] not in ['audit', 'repair']:
+        print("Usage: python completeness_audit.py <audit | repair> [directory] [--include-unpublished]")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    args = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+    directory = args[0] if args else '.'
+
+    if command == 'audit':
+        results = audit(directory)
+        if results.empty:
+            print(f"No scraper output files found in '{directory}'")
+            sys.exit(1)
+        print(results.groupby(['file', 'status']).size().unstack(fill_value=0).to_string())
+        problems = results[results['status'].isin(REPAIR_STATUSES)]
+        if not problems.empty:
+            print(f"\nSlices needing repair: {len(problems)}")
+            print(problems[['file', 'capture_period', 'breakdown', 'rows', 'expected_rows', 'status']].to_string(index=False))
+        filename = os.path.join(directory, AUDIT_FILENAME)
+        results.to_csv(filename, index=False)
+        print(f"\n✓ Audit saved to '{filename}'")
+    else:
+        statuses = REPAIR_STATUSES + (['unpublished'] if '--include-unpublished' in sys.argv else [])
+        repaired = repair(directory, statuses)
+        if not repaired.empty:
+            print(f"\n{'='*60}")
+            print(f"Repaired: {int(repaired['repaired'].sum())}/{len(repaired)}")
+            print(f"{'='*60}")
+
+
+if __name__ == '__main__':
+    main()
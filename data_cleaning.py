@@ -0,0 +1,360 @@
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+
+ENROLLMENT_FILE_PATTERN = 'MA_college_enrollment_*_*.csv'
+GRAD_RATE_FILE_PATTERN = 'MA_grad_rates_4yr_*_*.csv'
+VIOLATIONS_FILENAME = 'MA_validation_report.csv'
+
+KEY_COLUMNS = ['entity_name', 'entity_code', 'breakdown']
+
+ENROLLMENT_COUNT_COLUMNS = [
+    'High School Graduates (#)',
+    'Attending Coll./Univ. (#)'
+]
+
+ENROLLMENT_PERCENT_COLUMNS = [
+    'Attending Coll./Univ. (%)',
+    'Private Two-Year (%)',
+    'Private Four-Year (%)',
+    'Public Two-Year (%)',
+    'Public Four-Year (%)',
+    'MA Community College (%)',
+    'MA State University (%)',
+    'Univ.of Mass. (%)'
+]
+
+# Share of college-goers by institution type; these add up to ~100
+INSTITUTION_TYPE_COLUMNS = [
+    'Private Two-Year (%)',
+    'Private Four-Year (%)',
+    'Public Two-Year (%)',
+    'Public Four-Year (%)'
+]
+
+GRAD_RATE_COUNT_COLUMNS = [
+    '# in Cohort'
+]
+
+GRAD_RATE_PERCENT_COLUMNS = [
+    '% Graduated',
+    '% Still in School',
+    '% Non-Grad Completers',
+    '% H.S. Equiv',
+    '% Dropped Out',
+    '% Permanently Excluded'
+]
+
+VIOLATION_COLUMNS = ['file', 'row', 'entity_code', 'breakdown', 'check', 'column', 'expected', 'observed']
+
+
+def find_output_files(directory='.'):
+    """
+    Find all scraper output CSVs in a directory.
+
+    Args:
+        directory: Directory to search
+
+    Returns:
+        list: Sorted list of enrollment and graduation rate CSV paths
+    """
+    paths = glob.glob(os.path.join(directory, ENROLLMENT_FILE_PATTERN))
+    paths += glob.glob(os.path.join(directory, GRAD_RATE_FILE_PATTERN))
+    return sorted(paths)
+
+
+def detect_report(path):
+    """
+    Get the report kind from an output filename.
+
+    Args:
+        path: Path to a scraper output CSV
+
+    Returns:
+        str: 'enrollment' or 'graduation'
+    """
+    name = os.path.basename(path)
+    if name.startswith('MA_college_enrollment_'):
+        return 'enrollment'
+    if name.startswith('MA_grad_rates_4yr_'):
+        return 'graduation'
+    raise ValueError(f"Not a scraper output file: {path}")
+
+
+def parse_output_filename(path):
+    """
+    Split an output filename into its report, data type and year.
+
+    Args:
+        path: Path such as 'MA_college_enrollment_school_2024.csv'
+
+    Returns:
+        tuple: (report, data_type, year) e.g. ('enrollment', 'school', 2024)
+    """
+    report = detect_report(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    data_type, year = stem.split('_')[-2:]
+    return report, data_type, int(year)
+
+
+def get_metric_columns(report):
+    """
+    Get the count and percent columns for a report kind.
+
+    Args:
+        report: 'enrollment' or 'graduation'
+
+    Returns:
+        tuple: (count columns, percent columns)
+    """
+    if report == 'enrollment':
+        return ENROLLMENT_COUNT_COLUMNS, ENROLLMENT_PERCENT_COLUMNS
+    return GRAD_RATE_COUNT_COLUMNS, GRAD_RATE_PERCENT_COLUMNS
+
+
+def read_raw(path):
+    """
+    Read a scraper output CSV with every cell kept as a string.
+
+    Args:
+        path: Path to the CSV
+
+    Returns:
+        DataFrame: Raw frame, blank cells as ''
+    """
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def parse_numeric(raw):
+    """
+    Parse a frame of '81.6' / '1,234' / '' strings to float64.
+
+    Args:
+        raw: DataFrame of strings
+
+    Returns:
+        tuple: (float DataFrame with NaN for blanks, boolean DataFrame marking non-blank cells that failed to parse)
+    """
+    stripped = raw.apply(lambda col: col.str.strip().str.replace(',', '', regex=False))
+    values = stripped.apply(pd.to_numeric, errors='coerce').astype('float64')
+    unparseable = stripped.ne('') & values.isna()
+    return values, unparseable
+
+
+def clean_frame(raw, report):
+    """
+    Convert a raw output frame into typed columns.
+
+    Counts become nullable Int64, percentages float64 (NaN where suppressed),
+    and the low-cardinality text columns become categoricals.
+
+    Args:
+        raw: Raw frame from read_raw()
+        report: 'enrollment' or 'graduation'
+
+    Returns:
+        tuple: (typed DataFrame, boolean DataFrame of unparseable metric cells)
+    """
+    count_columns, percent_columns = get_metric_columns(report)
+    metric_columns = count_columns + percent_columns
+    values, unparseable = parse_numeric(raw[metric_columns])
+
+    df = pd.DataFrame(index=raw.index)
+    if report == 'enrollment':
+        df['year'] = pd.to_numeric(raw['year'], errors='coerce').astype('Int16')
+        df['capture_period'] = raw['capture_period'].astype('category')
+    df['entity_name'] = raw['entity_name'].str.strip()
+    # Codes keep their leading zeros
+    df['entity_code'] = raw['entity_code'].str.strip()
+    df['breakdown'] = raw['breakdown'].astype('category')
+
+    counts = values[count_columns]
+    # Counts that are not whole numbers are reported, not silently truncated
+    fractional = counts.notna() & (counts.to_numpy() % 1 != 0)
+    unparseable[count_columns] = unparseable[count_columns] | fractional
+    for column in count_columns:
+        df[column] = counts[column].where(~fractional[column]).round().astype('Int64')
+    for column in percent_columns:
+        df[column] = values[column]
+
+    return df, unparseable
+
+
+def _violations(path, df, mask, check, column, expected, observed):
+    """
+    Build violation records for rows flagged in a boolean mask.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    rows = np.flatnonzero(mask)
+    return pd.DataFrame({
+        'file': os.path.basename(path),
+        # 1-based line in the CSV (header is line 1)
+        'row': rows + 2,
+        'entity_code': df['entity_code'].to_numpy()[rows],
+        'breakdown': df['breakdown'].astype(str).to_numpy()[rows],
+        'check': check,
+        'column': column,
+        'expected': np.broadcast_to(np.asarray(expected, dtype=object), mask.shape)[rows],
+        'observed': np.broadcast_to(np.asarray(observed, dtype=object), mask.shape)[rows]
+    }, columns=VIOLATION_COLUMNS)
+
+
+def validate_frame(path, raw, df, unparseable, report, tolerance=1.0):
+    """
+    Run the consistency checks for one cleaned frame.
+
+    Checks that percentages lie in [0, 100], counts are non-negative, every
+    non-blank cell parsed, and:
+      - enrollment: Private/Public Two/Four-Year shares add up to ~100 and
+        Attending (#) / High School Graduates (#) matches Attending (%)
+      - graduation: outcome percentages add up to ~100
+
+    Args:
+        path: Source file path (used in the report)
+        raw: Raw frame from read_raw()
+        df: Typed frame from clean_frame()
+        unparseable: Boolean frame from clean_frame()
+        report: 'enrollment' or 'graduation'
+        tolerance: Allowed difference in percentage points for the sum checks
+
+    Returns:
+        DataFrame: One row per violation (see VIOLATION_COLUMNS)
+    """
+    count_columns, percent_columns = get_metric_columns(report)
+    found = []
+
+    for column in count_columns + percent_columns:
+        found.append(_violations(path, df, unparseable[column], 'unparseable', column, 'number', raw[column].to_numpy()))
+
+    percents = df[percent_columns].to_numpy()
+    out_of_range = (percents < 0) | (percents > 100)
+    for idx, column in enumerate(percent_columns):
+        found.append(_violations(path, df, out_of_range[:, idx], 'out_of_range', column, '0-100', percents[:, idx]))
+
+    counts = df[count_columns].to_numpy(dtype='float64', na_value=np.nan)
+    negative = counts < 0
+    for idx, column in enumerate(count_columns):
+        found.append(_violations(path, df, negative[:, idx], 'negative_count', column, '>= 0', counts[:, idx]))
+
+    if report == 'enrollment':
+        shares = df[INSTITUTION_TYPE_COLUMNS].to_numpy()
+        complete = ~np.isnan(shares).any(axis=1)
+        total = shares.sum(axis=1)
+        bad = complete & (np.abs(total - 100) > tolerance)
+        found.append(_violations(path, df, bad, 'institution_type_sum', 'Private/Public Two/Four-Year (%)', 100.0, np.round(total, 1)))
+
+        graduates = counts[:, 0]
+        attending = counts[:, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            derived = attending / graduates * 100
+        reported = df['Attending Coll./Univ. (%)'].to_numpy()
+        comparable = ~np.isnan(derived) & ~np.isnan(reported) & (graduates > 0)
+        # Reported percentages are rounded to one decimal
+        bad = comparable & (np.abs(derived - reported) > 0.1)
+        found.append(_violations(path, df, bad, 'attending_rate', 'Attending Coll./Univ. (%)', np.round(derived, 1), reported))
+
+        bad = (attending > graduates)
+        found.append(_violations(path, df, bad, 'attending_exceeds_graduates', 'Attending Coll./Univ. (#)', graduates, attending))
+    else:
+        outcomes = df[GRAD_RATE_PERCENT_COLUMNS].to_numpy()
+        complete = ~np.isnan(outcomes).any(axis=1)
+        total = outcomes.sum(axis=1)
+        bad = complete & (np.abs(total - 100) > tolerance)
+        found.append(_violations(path, df, bad, 'outcome_sum', 'Graduation outcomes (%)', 100.0, np.round(total, 1)))
+
+    found = [frame for frame in found if not frame.empty]
+    if not found:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return pd.concat(found, ignore_index=True)
+
+
+def process_file(path, tolerance=1.0):
+    """
+    Clean and validate a single output file.
+
+    Args:
+        path: Path to a scraper output CSV
+        tolerance: Allowed difference in percentage points for the sum checks
+
+    Returns:
+        tuple: (path, typed DataFrame, violations DataFrame)
+    """
+    report = detect_report(path)
+    raw = read_raw(path)
+    df, unparseable = clean_frame(raw, report)
+    violations = validate_frame(path, raw, df, unparseable, report, tolerance)
+    return path, df, violations
+
+
+def clean_and_validate(paths, max_workers=None, tolerance=1.0):
+    """
+    Clean and validate several output files in a process pool.
+
+    Args:
+        paths: List of scraper output CSV paths
+        max_workers: Number of worker processes (default: one per CPU, capped at the number of files)
+        tolerance: Allowed difference in percentage points for the sum checks
+
+    Returns:
+        tuple: (dict mapping path to typed DataFrame, combined violations DataFrame)
+    """
+    frames = {}
+    violations = []
+    if not paths:
+        return frames, pd.DataFrame(columns=VIOLATION_COLUMNS)
+
+    workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(process_file, paths, [tolerance] * len(paths))
+        for path, df, file_violations in results:
+            frames[path] = df
+            if not file_violations.empty:
+                violations.append(file_violations)
+
+    if not violations:
+        return frames, pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return frames, pd.concat(violations, ignore_index=True)
+
+
+def main():
+    """
+    Clean and validate every scraper output file and write a violations report.
+    """
+    directory = sys.argv[1] if len(sys.argv) > 1 else '.'
+    paths = find_output_files(directory)
+    if not paths:
+        print(f"No scraper output files found in '{directory}'")
+        sys.exit(1)
+
+    print(f"Validating {len(paths)} files...")
+    start = time.perf_counter()
+    frames, violations = clean_and_validate(paths)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'='*60}")
+    for path, df in frames.items():
+        count = int((violations['file'] == os.path.basename(path)).sum())
+        print(f"{os.path.basename(path)}: {len(df)} rows, {count} violations")
+    print(f"{'='*60}")
+    print(f"Total rows: {sum(len(df) for df in frames.values())}")
+    print(f"Total violations: {len(violations)}")
+    print(f"Elapsed: {elapsed:.2f}s")
+
+    if not violations.empty:
+        print("\nViolations by check:")
+        print(violations.groupby(['check', 'column']).size().to_string())
+
+    filename = os.path.join(directory, VIOLATIONS_FILENAME)
+    violations.to_csv(filename, index=False)
+    print(f"\n✓ Violations report saved to '{filename}'")
+
+
+if __name__ == '__main__':
+    main()
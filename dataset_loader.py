@@ -0,0 +1,331 @@
+import hashlib
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from data_cleaning import find_output_files, parse_output_filename, read_raw, clean_frame
+from normalized_output import get_flat_columns
+from panel_builder import unify_categories
+
+
+CACHE_DIRNAME = '.{filename}.cols'
+META_FILENAME = 'meta.json'
+CACHE_VERSION = 1
+# Columns derived from the filename rather than stored in the file
+FILE_COLUMNS = ['data_type', 'year']
+
+
+def get_cache_dir(path):
+    """
+    Get the directory holding the column cache of an output CSV.
+    """
+    return os.path.join(os.path.dirname(path), CACHE_DIRNAME.format(filename=os.path.basename(path)))
+
+
+def hash_file(path):
+    """
+    Get the SHA-256 of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_cache(path):
+    """
+    Parse an output CSV and store each typed column as a .npy file.
+
+    Text columns are stored as integer codes plus their distinct values,
+    nullable integers as values plus a mask, and floats as they are. The
+    metadata is written last, so readers never see a half-written cache.
+
+    Args:
+        path: Path to a scraper output CSV
+
+    Returns:
+        dict: Cache metadata
+    """
+    report, _, _ = parse_output_filename(path)
+    stat = os.stat(path)
+    sha256 = hash_file(path)
+    df, _ = clean_frame(read_raw(path), report)
+
+    cache_dir = get_cache_dir(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    columns = {}
+    for idx, column in enumerate(df.columns):
+        series = df[column]
+        # Files from an older build of the CSV stay readable until the metadata is replaced
+        prefix = f"{sha256[:12]}_{idx:02d}"
+        entry = {'dtype': str(series.dtype), 'files': {}}
+        if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(series):
+            codes, categories = pd.factorize(series, sort=True)
+            entry['kind'] = 'category' if isinstance(series.dtype, pd.CategoricalDtype) else 'text'
+            entry['categories'] = [str(value) for value in categories]
+            arrays = {'codes': codes.astype(np.int32)}
+        elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            entry['kind'] = 'nullable'
+            arrays = {
+                'values': series.to_numpy(dtype='int64', na_value=0),
+                'mask': series.isna().to_numpy()
+            }
+        else:
+            entry['kind'] = 'float'
+            arrays = {'values': series.to_numpy()}
+        for name, array in arrays.items():
+            filename = f"{prefix}_{name}.npy"
+            np.save(os.path.join(cache_dir, filename), array)
+            entry['files'][name] = filename
+        columns[column] = entry
+
+    meta = {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        'rows': len(df),
+        'columns': columns
+    }
+    tmp_path = os.path.join(cache_dir, META_FILENAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(cache_dir, META_FILENAME))
+
+    # Remove the column files of previous builds
+    current = {filename for entry in columns.values() for filename in entry['files'].values()}
+    for filename in os.listdir(cache_dir):
+        if filename.endswith('.npy') and filename not in current:
+            os.remove(os.path.join(cache_dir, filename))
+    return meta
+
+
+def get_cache(path):
+    """
+    Get the metadata of an up-to-date column cache, rebuilding it if needed.
+
+    The cache is reused when the CSV's size and mtime are unchanged. If they
+    changed but the contents hash the same (e.g. the file was only touched),
+    the cache is kept and its metadata updated.
+
+    Returns:
+        dict: Cache metadata
+    """
+    meta_path = os.path.join(get_cache_dir(path), META_FILENAME)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return write_cache(path)
+
+    stat = os.stat(path)
+    if meta.get('version') != CACHE_VERSION:
+        return write_cache(path)
+    if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+        return meta
+    if meta['size'] == stat.st_size and meta['sha256'] == hash_file(path):
+        meta['mtime_ns'] = stat.st_mtime_ns
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+        return meta
+    return write_cache(path)
+
+
+class CachedFile:
+    """
+    Memory-mapped columns of one output CSV.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.report, self.data_type, self.year = parse_output_filename(path)
+        self.meta = get_cache(path)
+        self.cache_dir = get_cache_dir(path)
+        self.rows = self.meta['rows']
+
+    @property
+    def columns(self):
+        stored = list(self.meta['columns'])
+        return [column for column in FILE_COLUMNS if column not in stored] + stored
+
+    def _array(self, column, name):
+        filename = self.meta['columns'][column]['files'][name]
+        return np.load(os.path.join(self.cache_dir, filename), mmap_mode='r')
+
+    def file_value(self, column):
+        """
+        Get the value of a column that is constant for the whole file, or None.
+        """
+        if column == 'data_type':
+            return self.data_type
+        if column == 'year' and column not in self.meta['columns']:
+            return self.year
+        return None
+
+    def mask(self, column, condition):
+        """
+        Evaluate a condition on one column without building the column.
+
+        Text columns are tested once per distinct value and the result is
+        looked up by code, so a filter on breakdown or entity_code reads
+        only the codes array.
+
+        Returns:
+            ndarray: Boolean row mask
+        """
+        entry = self.meta['columns'][column]
+        if entry['kind'] in ['category', 'text']:
+            categories = pd.Series(entry['categories'], dtype=object)
+            allowed = np.append(matches(categories, condition), False)
+            # Code -1 (missing) maps to the appended False
+            return allowed[self._array(column, 'codes')]
+        return matches(self.series(column), condition)
+
+    def series(self, column, rows=None):
+        """
+        Build one column, optionally only for the given row positions.
+
+        Returns:
+            Series: Column with the dtype it had in the cleaned frame
+        """
+        value = self.file_value(column)
+        if value is not None:
+            count = self.rows if rows is None else len(rows)
+            if column == 'year':
+                return pd.Series(np.full(count, value), name=column).astype('Int16')
+            return pd.Series(pd.Categorical.from_codes(np.zeros(count, dtype=np.int8), [value]), name=column)
+
+        entry = self.meta['columns'][column]
+        take = (lambda array: np.asarray(array)) if rows is None else (lambda array: np.asarray(array[rows]))
+        if entry['kind'] in ['category', 'text']:
+            codes = take(self._array(column, 'codes'))
+            values = pd.Categorical.from_codes(codes, categories=entry['categories'])
+            if entry['kind'] == 'text':
+                return pd.Series(np.asarray(values, dtype=object), name=column).astype(entry['dtype'])
+            return pd.Series(values, name=column)
+        if entry['kind'] == 'nullable':
+            values = pd.arrays.IntegerArray(take(self._array(column, 'values')), take(self._array(column, 'mask')))
+            return pd.Series(values, name=column).astype(entry['dtype'])
+        return pd.Series(take(self._array(column, 'values')), name=column)
+
+
+def matches(series, condition):
+    """
+    Evaluate a where-condition on a Series.
+
+    Args:
+        series: Values to test
+        condition: A value, a list/tuple/set of values, or a callable taking a Series and returning a boolean mask
+
+    Returns:
+        ndarray: Boolean mask
+    """
+    if callable(condition):
+        result = condition(series)
+        return np.asarray(pd.Series(result).fillna(False), dtype=bool)
+    if isinstance(condition, (list, tuple, set, frozenset)):
+        return np.asarray(series.isin(list(condition)).fillna(False), dtype=bool)
+    return np.asarray((series == condition).fillna(False), dtype=bool)
+
+
+def load(report, data_type=None, years=None, columns=None, where=None, directory='.'):
+    """
+    Load scraper outputs, reading only the requested columns and rows.
+
+    Each CSV gets a column cache next to it (memory-mapped .npy files), built
+    on first use and rebuilt when the CSV changes. Files are skipped by
+    data type and year from their filename, and where-conditions are applied
+    before any other column is built.
+
+    Args:
+        report: 'enrollment' or 'graduation'
+        data_type: 'school', 'district', a list of both, or None for both
+        years: A year or list of years (e.g., 2024); None for all
+        columns: Columns to return (default: all, plus data_type and year)
+        where: Dict of column -> value, list of values or callable (see matches())
+        directory: Directory containing the scraper outputs
+
+    Returns:
+        DataFrame: Matching rows with typed columns
+    """
+    data_types = [data_type] if isinstance(data_type, str) else data_type
+    if years is not None and not isinstance(years, (list, tuple, set)):
+        years = [years]
+    year_set = {int(year) for year in years} if years is not None else None
+    where = where or {}
+
+    # Columns of an empty result when none were requested
+    all_columns = FILE_COLUMNS + [column for column in get_flat_columns(report) if column not in FILE_COLUMNS]
+    frames = []
+    for path in find_output_files(directory):
+        file_report, file_type, file_year = parse_output_filename(path)
+        if file_report != report:
+            continue
+        if data_types is not None and file_type not in data_types:
+            continue
+        if year_set is not None and file_year not in year_set:
+            continue
+
+        cached = CachedFile(path)
+        all_columns = cached.columns
+        selected = columns or all_columns
+        unknown = [column for column in list(selected) + list(where) if column not in cached.columns]
+        if unknown:
+            raise KeyError(f"Unknown columns for {report}: {unknown}")
+
+        mask = np.ones(cached.rows, dtype=bool)
+        for column, condition in where.items():
+            value = cached.file_value(column)
+            if value is not None:
+                if not matches(pd.Series([value]), condition)[0]:
+                    mask[:] = False
+                    break
+            else:
+                mask &= cached.mask(column, condition)
+        if not mask.any():
+            continue
+
+        rows = None if mask.all() else np.flatnonzero(mask)
+        frames.append(pd.DataFrame({column: cached.series(column, rows) for column in selected}))
+
+    if not frames:
+        return pd.DataFrame(columns=columns or all_columns)
+    for column in frames[0].columns:
+        if all(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames):
+            unify_categories(frames, column)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    """
+    Build the column caches for every output file and compare load times.
+    """
+    directory = sys.argv[1] if len(sys.argv) > 1 else '.'
+    paths = find_output_files(directory)
+    if not paths:
+        print(f"No scraper output files found in '{directory}'")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    for path in paths:
+        get_cache(path)
+    print(f"✓ Column caches ready for {len(paths)} files in {time.perf_counter() - start:.2f}s")
+
+    for report in ['enrollment', 'graduation']:
+        start = time.perf_counter()
+        csv_rows = sum(len(pd.read_csv(path)) for path in paths if parse_output_filename(path)[0] == report)
+        csv_time = time.perf_counter() - start
+        start = time.perf_counter()
+        df = load(report, directory=directory)
+        load_time = time.perf_counter() - start
+        print(f"{report}: {csv_rows} rows, read_csv {csv_time:.3f}s, load() {len(df)} rows {load_time:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
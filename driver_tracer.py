@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+from collections import defaultdict
+import pandas as pd
+
+
+TRACE_ENV_VAR = 'SCRAPER_TRACE'
+TRACER_FILE = os.path.abspath(__file__)
+REPO_DIR = os.path.dirname(TRACER_FILE)
+
+
+class CommandTracer:
+    """
+    Count and time every WebDriver command sent by a driver.
+
+    All Selenium calls (find_elements, .text, clicks, WebDriverWait polling)
+    end up in WebDriver.execute(), one HTTP round-trip to chromedriver each.
+    The tracer wraps that method on the driver instance and attributes each
+    command to the scraper functions on the call stack.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.context = 'setup'
+        self.context_order = ['setup']
+        self.context_started = time.perf_counter()
+        self.wall_times = defaultdict(float)
+        # (context, stack, command) -> [calls, total seconds, max seconds]
+        self.stats = defaultdict(lambda: [0, 0.0, 0.0])
+        self._execute = None
+
+    def install(self):
+        """
+        Start tracing the driver's commands.
+        """
+        self._execute = self.driver.execute
+        self.driver.execute = self._traced_execute
+        return self
+
+    def uninstall(self):
+        """
+        Stop tracing and restore the driver's own execute().
+        """
+        if self._execute is not None:
+            self.driver.execute = self._execute
+            self._execute = None
+
+    def set_context(self, label):
+        """
+        Attribute the following commands to a new combination, e.g. '2020-21 MARCH AI'.
+        """
+        now = time.perf_counter()
+        self.wall_times[self.context] += now - self.context_started
+        self.context_started = now
+        self.context = label
+        if label not in self.wall_times:
+            self.context_order.append(label)
+
+    def _traced_execute(self, driver_command, params=None):
+        stack = self._get_stack()
+        start = time.perf_counter()
+        try:
+            return self._execute(driver_command, params)
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = self.stats[(self.context, stack, driver_command)]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+    def _get_stack(self):
+        """
+        Get the scraper functions on the current call stack, outermost first.
+
+        Frames in the repository are kept; WebDriverWait.until frames are kept
+        too so polling shows up separately from direct calls.
+        """
+        names = []
+        frame = sys._getframe(2)
+        while frame is not None:
+            code = frame.f_code
+            filename = code.co_filename
+            path = os.path.abspath(filename)
+            if os.path.dirname(path) == REPO_DIR:
+                if path != TRACER_FILE:
+                    names.append(code.co_name)
+            elif code.co_name == 'until' and filename.endswith('wait.py'):
+                names.append('WebDriverWait.until')
+            frame = frame.f_back
+        return tuple(reversed(names))
+
+    def summary(self):
+        """
+        Summarize commands per combination, calling function and command.
+
+        Commands issued while polling inside WebDriverWait.until are tagged
+        '[wait]' and attributed to the function that started the wait.
+
+        Returns:
+            DataFrame: calls, total/mean/max time per (context, function, command)
+        """
+        records = []
+        for (context, stack, command), (calls, total, longest) in self.stats.items():
+            functions = [name for name in stack if name != 'WebDriverWait.until']
+            if 'WebDriverWait.until' in stack:
+                # Polling from expected_conditions, e.g. element_to_be_clickable
+                command = f'{command} [wait]'
+            records.append({
+                'context': context,
+                'function': functions[-1] if functions else '<unknown>',
+                'command': command,
+                'calls': calls,
+                'total_s': total,
+                'max_ms': longest * 1000
+            })
+        if not records:
+            return pd.DataFrame(columns=['context', 'function', 'command', 'calls', 'total_s', 'mean_ms', 'max_ms'])
+        df = pd.DataFrame(records).groupby(['context', 'function', 'command'], sort=False).agg(
+            calls=('calls', 'sum'), total_s=('total_s', 'sum'), max_ms=('max_ms', 'max')
+        ).reset_index()
+        df.insert(5, 'mean_ms', df['total_s'] / df['calls'] * 1000)
+        return df
+
+    def context_summary(self):
+        """
+        Compare WebDriver time with wall time for each combination.
+
+        Returns:
+            DataFrame: commands, driver seconds and wall seconds per context
+        """
+        self.set_context(self.context)
+        df = self.summary()
+        per_context = df.groupby('context', sort=False).agg(commands=('calls', 'sum'), driver_s=('total_s', 'sum'))
+        per_context = per_context.reindex(self.context_order).fillna(0)
+        per_context['commands'] = per_context['commands'].astype(int)
+        per_context['wall_s'] = [self.wall_times[context] for context in per_context.index]
+        per_context['driver_share'] = per_context['driver_s'] / per_context['wall_s']
+        return per_context.reset_index()
+
+    def write(self, prefix):
+        """
+        Write '<prefix>_summary.csv', '<prefix>_contexts.csv' and '<prefix>.folded'.
+
+        The .folded file uses the collapsed-stack format ('a;b;c <weight>') read by
+        flamegraph.pl and speedscope; weights are microseconds.
+
+        Returns:
+            list: Paths written
+        """
+        paths = [f'{prefix}_summary.csv', f'{prefix}_contexts.csv', f'{prefix}.folded']
+        self.summary().to_csv(paths[0], index=False)
+        self.context_summary().to_csv(paths[1], index=False)
+
+        folded = defaultdict(float)
+        for (context, stack, command), (_, total, _) in self.stats.items():
+            folded[';'.join((context,) + stack + (command,))] += total
+        with open(paths[2], 'w') as f:
+            for line, total in folded.items():
+                f.write(f"{line} {max(1, round(total * 1e6))}\n")
+        return paths
+
+    def print_report(self, top=15):
+        """
+        Print the most expensive functions and commands over the whole run.
+        """
+        df = self.summary()
+        if df.empty:
+            print("No WebDriver commands were traced.")
+            return
+        totals = df.groupby(['function', 'command']).agg(calls=('calls', 'sum'), total_s=('total_s', 'sum'))
+        totals['mean_ms'] = totals['total_s'] / totals['calls'] * 1000
+        totals = totals.sort_values('total_s', ascending=False)
+        print(f"\n{'='*60}")
+        print(f"WebDriver commands: {int(totals['calls'].sum())} in {totals['total_s'].sum():.1f}s")
+        print(f"{'='*60}")
+        print(totals.head(top).to_string(float_format=lambda v: f'{v:.2f}'))
+
+
+def maybe_trace(driver):
+    """
+    Install a CommandTracer if the SCRAPER_TRACE environment variable is set.
+
+    Args:
+        driver: Selenium WebDriver instance
+
+    Returns:
+        CommandTracer: The installed tracer, or None when tracing is off
+    """
+    if not os.environ.get(TRACE_ENV_VAR):
+        return None
+    print("WebDriver command tracing enabled")
+    return CommandTracer(driver).install()
+
+
+def finish_trace(tracer, default_prefix):
+    """
+    Print and write a tracer's results. Does nothing if tracer is None.
+
+    Args:
+        tracer: CommandTracer or None
+        default_prefix: Output prefix used when SCRAPER_TRACE is just '1'
+    """
+    if tracer is None:
+        return
+    tracer.uninstall()
+    tracer.print_report()
+    value = os.environ.get(TRACE_ENV_VAR, '1')
+    prefix = default_prefix if value in ['1', 'true', 'yes'] else value
+    for path in tracer.write(prefix):
+        print(f"✓ Trace saved to '{path}'")
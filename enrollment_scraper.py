@@ -10,12 +10,22 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import pandas as pd
 import sys
 
+from driver_tracer import maybe_trace, finish_trace
+from table_script import get_table_cells, get_extraction_mode
+from snapshot_archive import get_archive
+from adaptive_timeout import AdaptiveTimeout
+from browser_recycling import get_recycler
+from normalized_output import save_output
+from preflight import run_preflight, preflight_enabled
+
 
 URL = 'https://profiles.doe.mass.edu/statereport/gradsattendingcollege.aspx'
 SUBGROUP_DROPDOWN_NAME = 'ddStudentGroup'
 YEAR_DROPDOWN_NAME = 'ddYear'
 ATTEND_RANGE_DROPDOWN_NAME = 'ddAttendRange'
 DATA_TYPE_NAME = 'ddReportType'
+# Cells in a data row of the 'teacherprogram' table
+COLUMN_COUNT = 12
 
 
 SUBGROUP_DROPDOWN_VALUES = {
@@ -117,6 +127,25 @@ def reset_page_state(driver, data_type, year, attend_range=None, wait_timeout=30
         print(f"  Warning: Could not click View Report: {e}")
 
 
+def load_page_state(driver, data_type, year, attend_range=None, wait_timeout=30):
+    """
+    Open the report page in a fresh browser and restore the form state.
+    
+    Args:
+        driver: Selenium WebDriver instance
+        data_type: 'school' or 'district'
+        year: Year string (e.g., '2019-20')
+        attend_range: Attend range value (e.g., 'MARCH' or '16_MONTH')
+        wait_timeout: Maximum time to wait for elements (seconds)
+    """
+    print(f"Navigating to {URL}...")
+    driver.get(URL)
+    WebDriverWait[Any](driver, wait_timeout).until(
+        EC.presence_of_element_located((By.NAME, SUBGROUP_DROPDOWN_NAME))
+    )
+    reset_page_state(driver, data_type, year, attend_range, wait_timeout)
+
+
 def map_year(year):
     """
     Map year format from '2019-20' to '2021'.
@@ -149,7 +178,63 @@ def get_capture_period(attend_range):
         return '16 Month'
     return 'Unknown'
 
-def get_data(driver, value, year, attend_range, wait_timeout=30):
+
+def get_output_filename(data_type, year):
+    """
+    Get the CSV filename the scraper writes for a data type and year.
+    
+    Args:
+        data_type: 'school' or 'district'
+        year: Year string (e.g., '2019-20')
+    
+    Returns:
+        str: Output filename (e.g., 'MA_college_enrollment_school_2021.csv')
+    """
+    return f'MA_college_enrollment_{data_type}_{map_year(year)}.csv'
+
+def parse_row(texts, value, year, attend_range):
+    """
+    Build an output row from the cell strings of one table row.
+    
+    Args:
+        texts: List of cell strings
+        value: Subgroup value code
+        year: Year string (e.g., '2019-20')
+        attend_range: Attend range value code
+    
+    Returns:
+        dict: Row data, or None for header/empty rows
+    """
+    # Skip rows that don't have enough cells (likely headers or empty rows)
+    if len(texts) < COLUMN_COUNT:
+        return None
+    
+    texts = [text.strip() if text else '' for text in texts]
+    result = {
+        'year': map_year(year),
+        'capture_period': get_capture_period(attend_range),
+        'entity_name': texts[0],
+        'entity_code': texts[1],
+        'breakdown': SUBGROUP_DROPDOWN_VALUES.get(value, value),
+        'High School Graduates (#)': texts[2],
+        'Attending Coll./Univ. (#)': texts[3],
+        'Attending Coll./Univ. (%)': texts[4],
+        'Private Two-Year (%)': texts[5],
+        'Private Four-Year (%)': texts[6],
+        'Public Two-Year (%)': texts[7],
+        'Public Four-Year (%)': texts[8],
+        'MA Community College (%)': texts[9],
+        'MA State University (%)': texts[10],
+        'Univ.of Mass. (%)': texts[11]
+    }
+    
+    # Only keep rows with actual data (entity_name should not be empty)
+    if not result['entity_name']:
+        return None
+    return result
+
+
+def get_data(driver, value, year, attend_range, wait_timeout=30, extraction='elements'):
     """
     Extract data from the college enrollment table.
     
@@ -159,6 +244,8 @@ def get_data(driver, value, year, attend_range, wait_timeout=30):
         year: Year string (e.g., '2019-20')
         attend_range: Attend range value code
         wait_timeout: Maximum time to wait for table to appear (seconds)
+        extraction: 'elements' to read each cell through WebDriver, or 'script'
+            to read the whole table with a single execute_script call
     
     Returns:
         list: List of dictionaries containing row data
@@ -172,50 +259,39 @@ def get_data(driver, value, year, attend_range, wait_timeout=30):
             EC.presence_of_element_located((By.ID, 'teacherprogram'))
         )
         
-        # Find tbody within the table (not the entire page)
-        # Try to find tbody, if not found, use table directly
-        try:
-            tbody = table.find_element(By.TAG_NAME, 'tbody')
-            rows = tbody.find_elements(By.TAG_NAME, 'tr')
-        except NoSuchElementException:
-            # If no tbody, get rows directly from table
-            rows = table.find_elements(By.TAG_NAME, 'tr')
-        
-        # Skip header row if present (first row might be header)
-        for idx, row in enumerate(rows):
-            try:
-                cells = row.find_elements(By.TAG_NAME, 'td')
-                
-                # Skip rows that don't have enough cells (likely headers or empty rows)
-                if len(cells) < 12:
-                    continue
-                
-                result = {
-                    'year': map_year(year),
-                    'capture_period': get_capture_period(attend_range),
-                    'entity_name': cells[0].text.strip() if cells[0].text else '',
-                    'entity_code': cells[1].text.strip() if cells[1].text else '',
-                    'breakdown': SUBGROUP_DROPDOWN_VALUES.get(value, value),
-                    'High School Graduates (#)': cells[2].text.strip() if len(cells) > 2 and cells[2].text else '',
-                    'Attending Coll./Univ. (#)': cells[3].text.strip() if len(cells) > 3 and cells[3].text else '',
-                    'Attending Coll./Univ. (%)': cells[4].text.strip() if len(cells) > 4 and cells[4].text else '',
-                    'Private Two-Year (%)': cells[5].text.strip() if len(cells) > 5 and cells[5].text else '',
-                    'Private Four-Year (%)': cells[6].text.strip() if len(cells) > 6 and cells[6].text else '',
-                    'Public Two-Year (%)': cells[7].text.strip() if len(cells) > 7 and cells[7].text else '',
-                    'Public Four-Year (%)': cells[8].text.strip() if len(cells) > 8 and cells[8].text else '',
-                    'MA Community College (%)': cells[9].text.strip() if len(cells) > 9 and cells[9].text else '',
-                    'MA State University (%)': cells[10].text.strip() if len(cells) > 10 and cells[10].text else '',
-                    'Univ.of Mass. (%)': cells[11].text.strip() if len(cells) > 11 and cells[11].text else ''
-                }
-                
-                # Only add rows with actual data (entity_name should not be empty)
-                if result['entity_name']:
+        if extraction == 'script':
+            # One round-trip for the whole table instead of one per cell
+            for texts in get_table_cells(driver, 'teacherprogram') or []:
+                result = parse_row(texts, value, year, attend_range)
+                if result:
                     data.append(result)
+        else:
+            # Find tbody within the table (not the entire page)
+            # Try to find tbody, if not found, use table directly
+            try:
+                tbody = table.find_element(By.TAG_NAME, 'tbody')
+                rows = tbody.find_elements(By.TAG_NAME, 'tr')
+            except NoSuchElementException:
+                # If no tbody, get rows directly from table
+                rows = table.find_elements(By.TAG_NAME, 'tr')
+            
+            # Skip header row if present (first row might be header)
+            for idx, row in enumerate(rows):
+                try:
+                    cells = row.find_elements(By.TAG_NAME, 'td')
                     
-            except (IndexError, NoSuchElementException) as e:
-                # Skip rows that cause errors
-                print(f"Warning: Skipping row {idx} due to error: {e}")
-                continue
+                    # Skip rows that don't have enough cells (likely headers or empty rows)
+                    if len(cells) < COLUMN_COUNT:
+                        continue
+                    
+                    result = parse_row([cell.text for cell in cells], value, year, attend_range)
+                    if result:
+                        data.append(result)
+                        
+                except (IndexError, NoSuchElementException) as e:
+                    # Skip rows that cause errors
+                    print(f"Warning: Skipping row {idx} due to error: {e}")
+                    continue
         
         if not data:
             print(f"Warning: No data found for subgroup {value}")
@@ -230,7 +306,7 @@ def get_data(driver, value, year, attend_range, wait_timeout=30):
     return data
 
 
-def handle_subgroup(driver, value, data_type=None, year=None, attend_range=None, max_retries=2, wait_timeout=30):
+def handle_subgroup(driver, value, data_type=None, year=None, attend_range=None, max_retries=2, wait_timeout=30, extraction='elements', archive=None, timeouts=None):
     """
     Handle selecting a subgroup and retrieving its data with retry logic.
     
@@ -242,6 +318,9 @@ def handle_subgroup(driver, value, data_type=None, year=None, attend_range=None,
         attend_range: Attend range value code
         max_retries: Maximum number of retry attempts
         wait_timeout: Maximum time to wait for elements (seconds)
+        extraction: Table extraction mode passed to get_data ('elements' or 'script')
+        archive: SnapshotArchive to save the report page to (optional)
+        timeouts: Optional AdaptiveTimeout fed with how long the table took to appear after View Report
     
     Returns:
         list: List of dictionaries containing row data, or empty list on error
@@ -296,14 +375,24 @@ def handle_subgroup(driver, value, data_type=None, year=None, attend_range=None,
             # Wait for the table to appear with a longer timeout
             try:
                 # Wait for table to be present and stable
+                start = time.perf_counter()
                 wait.until(
                     EC.presence_of_element_located((By.ID, 'teacherprogram'))
                 )
+                if timeouts:
+                    timeouts.observe(time.perf_counter() - start)
                 # Additional small wait for table content to fully render
                 time.sleep(1)
                 
+                # Save the raw page so it can be re-parsed offline
+                if archive:
+                    try:
+                        archive.save(driver.page_source, 'enrollment', data_type, value, year, attend_range)
+                    except Exception as e:
+                        print(f"  Warning: Could not archive page: {e}")
+                
                 # Extract data
-                data = get_data(driver, value, year, attend_range, wait_timeout)
+                data = get_data(driver, value, year, attend_range, wait_timeout, extraction)
                 if data:
                     return data
                 else:
@@ -313,6 +402,8 @@ def handle_subgroup(driver, value, data_type=None, year=None, attend_range=None,
                     return []
                     
             except TimeoutException:
+                if timeouts:
+                    timeouts.observe_failure()
                 if attempt < max_retries:
                     print(f"  Table did not appear, will retry...")
                     continue
@@ -461,6 +552,7 @@ def main():
     Main function to scrape college enrollment data for all subgroups and attend ranges.
     """
     driver = None
+    tracer = None
     if len(sys.argv) < 3:
         print("Usage: python enrollment_scraper.py <data_type> <year>")
         print("  data_type: 'school' or 'district'")
@@ -479,8 +571,20 @@ def main():
             print("The scraper supports only: '2019-20', '2020-21', '2021-22', '2022-23', '2023-24'")
             sys.exit(1)
 
+        extraction = get_extraction_mode()
+        print(f"Table extraction mode: {extraction}")
+        archive = get_archive()
+        timeouts = AdaptiveTimeout()
+        recycler = get_recycler()
+        
         driver = webdriver.Chrome()
         
+        # Fail in seconds, rather than after every subgroup times out, if the page changed
+        if preflight_enabled() and not run_preflight(driver, 'enrollment', data_type):
+            sys.exit(1)
+        
+        tracer = maybe_trace(driver)
+        
         # Navigate to the page
         print(f"Navigating to {URL}...")
         driver.get(URL)
@@ -527,6 +631,8 @@ def main():
             
             # Select attend range (only need to change it if it's not the first one)
             if attend_range_idx > 1:
+                if tracer:
+                    tracer.set_context(f"{attend_range_value} setup")
                 select_attend_range(driver, attend_range_value)
                 # Click View Report after changing attend range
                 try:
@@ -542,11 +648,24 @@ def main():
             for idx, (value, name) in enumerate(SUBGROUP_DROPDOWN_VALUES.items(), 1):
                 current_combination += 1
                 print(f"\n[{current_combination}/{total_combinations}] Processing: {name} ({value}) for {attend_range_name}")
+                if tracer:
+                    tracer.set_context(f"{attend_range_value} {value}")
                 
                 try:
-                    data = handle_subgroup(driver, value, data_type=data_type, year=year, attend_range=attend_range_value)
+                    reason = recycler.check(driver) if recycler else None
+                    if reason:
+                        print(f"  Restarting browser: {reason}")
+                        driver = recycler.recycle(
+                            driver, lambda new: load_page_state(new, data_type, year, attend_range_value), tracer
+                        )
+                        wait = WebDriverWait[WebDriver](driver, 30)
+                    
+                    start = time.perf_counter()
+                    data = handle_subgroup(driver, value, data_type=data_type, year=year, attend_range=attend_range_value, wait_timeout=timeouts.current(), extraction=extraction, archive=archive, timeouts=timeouts)
                     
                     if data:
+                        if recycler:
+                            recycler.observe(time.perf_counter() - start)
                         final_data.extend(data)
                         successful += 1
                         print(f"✓ Successfully extracted {len(data)} rows for {name} ({attend_range_name})")
@@ -570,6 +689,8 @@ def main():
         print(f"Successful: {successful}/{total_combinations}")
         print(f"Failed: {failed}/{total_combinations}")
         print(f"Total rows collected: {len(final_data)}")
+        if recycler and recycler.restarts:
+            print(f"Browser restarts: {recycler.restarts}")
         print(f"{'='*60}")
         
         if final_data:
@@ -579,9 +700,9 @@ def main():
             print(df.head())
             
             # Save to CSV
-            filename = f'MA_college_enrollment_{data_type}_{map_year(year)}.csv'
-            df.to_csv(filename, index=False)
-            print(f"\n✓ Data saved to '{filename}'")
+            filename = get_output_filename(data_type, year)
+            for path in save_output(df, filename):
+                print(f"\n✓ Data saved to '{path}'")
         else:
             print("\nWarning: No data was collected!")
             
@@ -591,6 +712,8 @@ def main():
         traceback.print_exc()
         
     finally:
+        if tracer:
+            finish_trace(tracer, get_output_filename(data_type, year)[:-len('.csv')] + '_trace')
         if driver:
             print("\nClosing browser...")
             driver.quit()
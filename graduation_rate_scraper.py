@@ -10,10 +10,20 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import pandas as pd
 import sys
 
+from driver_tracer import maybe_trace, finish_trace
+from table_script import get_table_cells, get_extraction_mode
+from snapshot_archive import get_archive
+from adaptive_timeout import AdaptiveTimeout
+from browser_recycling import get_recycler
+from normalized_output import save_output
+from preflight import run_preflight, preflight_enabled
+
 
 URL = 'https://profiles.doe.mass.edu/statereport/gradrates.aspx'
 DROPDOWN_NAME = 'ctl00$ContentPlaceHolder1$ddSubgroup'
 DATA_TYPE_NAME = 'ctl00$ContentPlaceHolder1$ddReportType'
+# Cells in a data row of the 'tblStateReport' table
+COLUMN_COUNT = 9
 
 DROPDOWN_VALUES = {
     "AI": "American Indian or Alaska Native",
@@ -33,9 +43,59 @@ DROPDOWN_VALUES = {
     "MA": "Male"
 }
 
+REPORT_YEAR = '2024'
+
+
+def get_output_filename(data_type):
+    """
+    Get the CSV filename the scraper writes for a data type.
+    
+    Args:
+        data_type: 'school' or 'district'
+    
+    Returns:
+        str: Output filename (e.g., 'MA_grad_rates_4yr_school_2024.csv')
+    """
+    return f'MA_grad_rates_4yr_{data_type}_{REPORT_YEAR}.csv'
+
 
 
-def get_data(driver, value, wait_timeout=30):
+def parse_row(texts, value):
+    """
+    Build an output row from the cell strings of one table row.
+    
+    Args:
+        texts: List of cell strings
+        value: Subgroup value code
+    
+    Returns:
+        dict: Row data, or None for header/empty rows
+    """
+    # Skip rows that don't have enough cells (likely headers or empty rows)
+    if len(texts) < COLUMN_COUNT:
+        return None
+    
+    texts = [text.strip() if text else '' for text in texts]
+    result = {
+        'entity_name': texts[0],
+        'entity_code': texts[1],
+        'breakdown': DROPDOWN_VALUES.get(value, value),
+        '# in Cohort': texts[2],
+        '% Graduated': texts[3],
+        '% Still in School': texts[4],
+        '% Non-Grad Completers': texts[5],
+        '% H.S. Equiv': texts[6],
+        '% Dropped Out': texts[7],
+        '% Permanently Excluded': texts[8]
+    }
+    
+    # Only keep rows with actual data (entity_name should not be empty)
+    if not result['entity_name']:
+        return None
+    return result
+
+
+def get_data(driver, value, wait_timeout=30, extraction='elements'):
     """
     Extract data from the graduation rates table.
     
@@ -43,6 +103,8 @@ def get_data(driver, value, wait_timeout=30):
         driver: Selenium WebDriver instance
         value: Subgroup value code
         wait_timeout: Maximum time to wait for table to appear (seconds)
+        extraction: 'elements' to read each cell through WebDriver, or 'script'
+            to read the whole table with a single execute_script call
     
     Returns:
         list: List of dictionaries containing row data
@@ -56,45 +118,39 @@ def get_data(driver, value, wait_timeout=30):
             EC.presence_of_element_located((By.ID, 'tblStateReport'))
         )
         
-        # Find tbody within the table (not the entire page)
-        # Try to find tbody, if not found, use table directly
-        try:
-            tbody = table.find_element(By.TAG_NAME, 'tbody')
-            rows = tbody.find_elements(By.TAG_NAME, 'tr')
-        except NoSuchElementException:
-            # If no tbody, get rows directly from table
-            rows = table.find_elements(By.TAG_NAME, 'tr')
-        
-        # Skip header row if present (first row might be header)
-        for idx, row in enumerate(rows):
-            try:
-                cells = row.find_elements(By.TAG_NAME, 'td')
-                
-                # Skip rows that don't have enough cells (likely headers or empty rows)
-                if len(cells) < 9:
-                    continue
-                
-                result = {
-                    'entity_name': cells[0].text.strip() if cells[0].text else '',
-                    'entity_code': cells[1].text.strip() if cells[1].text else '',
-                    'breakdown': DROPDOWN_VALUES.get(value, value),
-                    '# in Cohort': cells[2].text.strip() if len(cells) > 2 and cells[2].text else '',
-                    '% Graduated': cells[3].text.strip() if len(cells) > 3 and cells[3].text else '',
-                    '% Still in School': cells[4].text.strip() if len(cells) > 4 and cells[4].text else '',
-                    '% Non-Grad Completers': cells[5].text.strip() if len(cells) > 5 and cells[5].text else '',
-                    '% H.S. Equiv': cells[6].text.strip() if len(cells) > 6 and cells[6].text else '',
-                    '% Dropped Out': cells[7].text.strip() if len(cells) > 7 and cells[7].text else '',
-                    '% Permanently Excluded': cells[8].text.strip() if len(cells) > 8 and cells[8].text else ''
-                }
-                
-                # Only add rows with actual data (entity_name should not be empty)
-                if result['entity_name']:
+        if extraction == 'script':
+            # One round-trip for the whole table instead of one per cell
+            for texts in get_table_cells(driver, 'tblStateReport') or []:
+                result = parse_row(texts, value)
+                if result:
                     data.append(result)
+        else:
+            # Find tbody within the table (not the entire page)
+            # Try to find tbody, if not found, use table directly
+            try:
+                tbody = table.find_element(By.TAG_NAME, 'tbody')
+                rows = tbody.find_elements(By.TAG_NAME, 'tr')
+            except NoSuchElementException:
+                # If no tbody, get rows directly from table
+                rows = table.find_elements(By.TAG_NAME, 'tr')
+            
+            # Skip header row if present (first row might be header)
+            for idx, row in enumerate(rows):
+                try:
+                    cells = row.find_elements(By.TAG_NAME, 'td')
                     
-            except (IndexError, NoSuchElementException) as e:
-                # Skip rows that cause errors
-                print(f"Warning: Skipping row {idx} due to error: {e}")
-                continue
+                    # Skip rows that don't have enough cells (likely headers or empty rows)
+                    if len(cells) < COLUMN_COUNT:
+                        continue
+                    
+                    result = parse_row([cell.text for cell in cells], value)
+                    if result:
+                        data.append(result)
+                        
+                except (IndexError, NoSuchElementException) as e:
+                    # Skip rows that cause errors
+                    print(f"Warning: Skipping row {idx} due to error: {e}")
+                    continue
         
         if not data:
             print(f"Warning: No data found for subgroup {value}")
@@ -150,7 +206,24 @@ def reset_page_state(driver, data_type, wait_timeout=30):
             print(f"  Warning: Could not reset data type: {e}")
 
 
-def handle_subgroup(driver, value, data_type=None, max_retries=2, wait_timeout=30):
+def load_page_state(driver, data_type, wait_timeout=30):
+    """
+    Open the report page in a fresh browser and restore the data type.
+    
+    Args:
+        driver: Selenium WebDriver instance
+        data_type: 'school' or 'district'
+        wait_timeout: Maximum time to wait for elements (seconds)
+    """
+    print(f"Navigating to {URL}...")
+    driver.get(URL)
+    WebDriverWait[Any](driver, wait_timeout).until(
+        EC.presence_of_element_located((By.NAME, DROPDOWN_NAME))
+    )
+    reset_page_state(driver, data_type, wait_timeout)
+
+
+def handle_subgroup(driver, value, data_type=None, max_retries=2, wait_timeout=30, extraction='elements', archive=None, timeouts=None):
     """
     Handle selecting a subgroup and retrieving its data with retry logic.
     
@@ -160,6 +233,9 @@ def handle_subgroup(driver, value, data_type=None, max_retries=2, wait_timeout=3
         data_type: 'school' or 'district' (for retry/reload)
         max_retries: Maximum number of retry attempts
         wait_timeout: Maximum time to wait for elements (seconds)
+        extraction: Table extraction mode passed to get_data ('elements' or 'script')
+        archive: SnapshotArchive to save the report page to (optional)
+        timeouts: Optional AdaptiveTimeout fed with how long the table took to appear after View Report
     
     Returns:
         list: List of dictionaries containing row data, or empty list on error
@@ -214,14 +290,24 @@ def handle_subgroup(driver, value, data_type=None, max_retries=2, wait_timeout=3
             # Wait for the table to appear with a longer timeout
             try:
                 # Wait for table to be present and stable
+                start = time.perf_counter()
                 wait.until(
                     EC.presence_of_element_located((By.ID, 'tblStateReport'))
                 )
+                if timeouts:
+                    timeouts.observe(time.perf_counter() - start)
                 # Additional small wait for table content to fully render
                 time.sleep(1)
                 
+                # Save the raw page so it can be re-parsed offline
+                if archive:
+                    try:
+                        archive.save(driver.page_source, 'graduation', data_type, value)
+                    except Exception as e:
+                        print(f"  Warning: Could not archive page: {e}")
+                
                 # Extract data
-                data = get_data(driver, value, wait_timeout)
+                data = get_data(driver, value, wait_timeout, extraction)
                 if data:
                     return data
                 else:
@@ -231,6 +317,8 @@ def handle_subgroup(driver, value, data_type=None, max_retries=2, wait_timeout=3
                     return []
                     
             except TimeoutException:
+                if timeouts:
+                    timeouts.observe_failure()
                 if attempt < max_retries:
                     print(f"  Table did not appear, will retry...")
                     continue
@@ -302,6 +390,7 @@ def main():
     Main function to scrape graduation rate data for all subgroups.
     """
     driver = None
+    tracer = None
     if len(sys.argv) < 2:
         print("Usage: python graduation_rate_scraper.py <data_type> [district | school]")
         sys.exit(1)
@@ -313,8 +402,20 @@ def main():
             print('Unsupported data type Please use school or district as an argument')
             sys.exit(1)
 
+        extraction = get_extraction_mode()
+        print(f"Table extraction mode: {extraction}")
+        archive = get_archive()
+        timeouts = AdaptiveTimeout()
+        recycler = get_recycler()
+        
         driver = webdriver.Chrome()
         
+        # Fail in seconds, rather than after every subgroup times out, if the page changed
+        if preflight_enabled() and not run_preflight(driver, 'graduation', data_type):
+            sys.exit(1)
+        
+        tracer = maybe_trace(driver)
+        
         # Navigate to the page
         print(f"Navigating to {URL}...")
         driver.get(URL)
@@ -338,11 +439,21 @@ def main():
         
         for idx, (value, name) in enumerate[tuple[str, str]](DROPDOWN_VALUES.items(), 1):
             print(f"\n[{idx}/{total_subgroups}] Processing: {name} ({value})")
+            if tracer:
+                tracer.set_context(value)
             
             try:
-                data = handle_subgroup(driver, value, data_type=data_type)
+                reason = recycler.check(driver) if recycler else None
+                if reason:
+                    print(f"  Restarting browser: {reason}")
+                    driver = recycler.recycle(driver, lambda new: load_page_state(new, data_type), tracer)
+                
+                start = time.perf_counter()
+                data = handle_subgroup(driver, value, data_type=data_type, wait_timeout=timeouts.current(), extraction=extraction, archive=archive, timeouts=timeouts)
                 
                 if data:
+                    if recycler:
+                        recycler.observe(time.perf_counter() - start)
                     final_data.extend(data)
                     successful += 1
                     print(f"✓ Successfully extracted {len(data)} rows for {name}")
@@ -364,6 +475,8 @@ def main():
         print(f"Successful: {successful}/{total_subgroups}")
         print(f"Failed: {failed}/{total_subgroups}")
         print(f"Total rows collected: {len(final_data)}")
+        if recycler and recycler.restarts:
+            print(f"Browser restarts: {recycler.restarts}")
         print(f"{'='*60}")
         
         if final_data:
@@ -373,9 +486,9 @@ def main():
             print(df.head())
             
             # Save to CSV
-            filename = f'MA_grad_rates_4yr_{data_type}_2024.csv'
-            df.to_csv(filename, index=False)
-            print(f"\n✓ Data saved to '{filename}'")
+            filename = get_output_filename(data_type)
+            for path in save_output(df, filename):
+                print(f"\n✓ Data saved to '{path}'")
         else:
             print("\nWarning: No data was collected!")
             
@@ -385,6 +498,8 @@ def main():
         traceback.print_exc()
         
     finally:
+        if tracer:
+            finish_trace(tracer, get_output_filename(data_type)[:-len('.csv')] + '_trace')
         if driver:
             print("\nClosing browser...")
             driver.quit()
@@ -0,0 +1,411 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import pandas as pd
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import Select
+
+from browser_memory import get_driver_rss, get_process_tree_rss
+from preflight import VIEW_REPORT_XPATH
+from snapshot_archive import TABLE_IDS, get_archive
+from table_script import get_table_cells
+from work_queue import (
+    REPORTS,
+    LEASE_SECONDS,
+    connect,
+    enqueue,
+    lease,
+    ack,
+    nack,
+    get_job_state,
+    get_request_delay,
+    is_session_alive,
+    quit_driver,
+    prepare_page
+)
+
+
+DEFAULT_TABS = 4
+TAB_TIMEOUT = 60
+POLL_INTERVAL = 0.2
+# Minimum gap between two View Report clicks, to stay polite to the server
+FIRE_INTERVAL = 1.0
+
+# Marks the current table as stale and clicks View Report without waiting
+# for the postback, so the driver can move on to another tab immediately.
+# The button is found with the same XPath the scrapers and preflight use.
+FIRE_SCRIPT = """
+const table = document.getElementById(arguments[0]);
+if (table) {
+    table.setAttribute('data-stale', '1');
+}
+const button = document.evaluate(
+    arguments[1], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+if (!button) {
+    return false;
+}
+setTimeout(() => button.click(), 0);
+return true;
+"""
+
+# The report is ready once the page finished loading and the table was
+# replaced by the postback (the new table has no stale marker).
+READY_SCRIPT = """
+const table = document.getElementById(arguments[0]);
+return document.readyState === 'complete' && !!table && !table.hasAttribute('data-stale');
+"""
+
+
+def get_subgroup_dropdown_name(report):
+    """
+    Get the name of the subgroup dropdown for a report.
+    """
+    if report == 'enrollment':
+        return REPORTS[report].SUBGROUP_DROPDOWN_NAME
+    return REPORTS[report].DROPDOWN_NAME
+
+
+class Tab:
+    """
+    One browser tab with its own form state and at most one job in flight.
+    """
+
+    def __init__(self, handle, worker):
+        self.handle = handle
+        self.worker = worker
+        self.state = None
+        self.job = None
+        self.started = None
+
+
+def open_tabs(driver, count):
+    """
+    Open tabs in one browser window set.
+
+    Args:
+        driver: Selenium WebDriver instance
+        count: Number of tabs
+
+    Returns:
+        list: Tab objects, the first one reusing the current window
+    """
+    base = f"{socket.gethostname()}:{os.getpid()}"
+    tabs = [Tab(driver.current_window_handle, f"{base}:tab1")]
+    for idx in range(2, count + 1):
+        driver.switch_to.new_window('tab')
+        tabs.append(Tab(driver.current_window_handle, f"{base}:tab{idx}"))
+    return tabs
+
+
+def fire_job(driver, tab, job):
+    """
+    Put a tab in the job's form state, select the subgroup and click View Report.
+
+    Only the form reset (needed when the tab's data type, year or attend
+    range differs from the job's) blocks; the report itself loads in the
+    background.
+    """
+    driver.switch_to.window(tab.handle)
+    if get_job_state(job) != tab.state:
+        prepare_page(driver, job)
+        tab.state = get_job_state(job)
+
+    select = Select(driver.find_element(By.NAME, get_subgroup_dropdown_name(job['report'])))
+    select.select_by_value(job['subgroup'])
+    if not driver.execute_script(FIRE_SCRIPT, TABLE_IDS[job['report']], VIEW_REPORT_XPATH):
+        raise RuntimeError("View Report button not found")
+
+    tab.job = job
+    tab.started = time.perf_counter()
+
+
+def collect_job(driver, tab, archive=None):
+    """
+    Read the finished report in a tab.
+
+    Returns:
+        list: Row dictionaries, or None while the report is still loading
+    """
+    job = tab.job
+    driver.switch_to.window(tab.handle)
+    table_id = TABLE_IDS[job['report']]
+    if not driver.execute_script(READY_SCRIPT, table_id):
+        return None
+
+    if archive:
+        try:
+            archive.save(driver.page_source, job['report'], job['data_type'], job['subgroup'],
+                         job['year'], job['attend_range'])
+        except Exception as e:
+            print(f"  Warning: Could not archive page: {e}")
+
+    scraper = REPORTS[job['report']]
+    data = []
+    for texts in get_table_cells(driver, table_id) or []:
+        if job['report'] == 'enrollment':
+            result = scraper.parse_row(texts, job['subgroup'], job['year'], job['attend_range'])
+        else:
+            result = scraper.parse_row(texts, job['subgroup'])
+        if result:
+            data.append(result)
+    return data
+
+
+def run_tab_worker(db_path, tab_count=DEFAULT_TABS, tab_timeout=TAB_TIMEOUT, lease_seconds=LEASE_SECONDS):
+    """
+    Work through the queue with several tabs of a single Chrome instance.
+
+    Each tab leases its own job, fires View Report and is then left alone
+    while the server builds the report; the driver meanwhile serves the
+    other tabs. Reports are read with a single execute_script call. If
+    Chrome dies, the jobs in flight go back to the queue and a new browser
+    is started.
+
+    Args:
+        db_path: Path to the queue database
+        tab_count: Number of tabs
+        tab_timeout: Seconds a tab may wait for its report before the job is returned to the queue
+        lease_seconds: Lease duration for each job
+
+    Returns:
+        tuple: (jobs done, jobs failed, peak browser RSS in bytes or None)
+    """
+    conn = connect(db_path)
+    archive = get_archive()
+    fire_interval = get_request_delay(FIRE_INTERVAL)
+    driver = None
+    tabs = []
+    done = 0
+    failed = 0
+    peak_rss = None
+    last_fire = 0.0
+
+    def release(tab, error):
+        nonlocal failed
+        nack(conn, tab.job['id'], tab.worker, error)
+        failed += 1
+        # Start the tab from a fresh page for its next job
+        tab.state = None
+        tab.job = None
+
+    def start_browser():
+        nonlocal driver, tabs
+        driver = webdriver.Chrome()
+        tabs = open_tabs(driver, tab_count)
+        print(f"Opened {len(tabs)} tabs")
+
+    def recover(error):
+        """
+        Restart Chrome if its session died. Returns True if it was restarted.
+        """
+        if is_session_alive(driver):
+            return False
+        print("✗ Browser session is gone, returning its jobs and starting a new browser")
+        for tab in tabs:
+            if tab.job is not None:
+                release(tab, error)
+        quit_driver(driver)
+        start_browser()
+        return True
+
+    try:
+        start_browser()
+
+        while True:
+            leased = False
+            for tab in tabs:
+                if tab.job is not None:
+                    continue
+                job = lease(conn, tab.worker, tab.state, lease_seconds)
+                if job is None:
+                    break
+                leased = True
+                wait = fire_interval - (time.perf_counter() - last_fire)
+                if wait > 0:
+                    time.sleep(wait)
+                print(f"[{tab.worker}] Job {job['id']}: {job['report']} {job['data_type']} "
+                      f"{job['year']} {job['attend_range']} {job['subgroup']}".replace('  ', ' '))
+                try:
+                    fire_job(driver, tab, job)
+                    last_fire = time.perf_counter()
+                except Exception as e:
+                    tab.job = job
+                    release(tab, str(e))
+                    print(f"✗ Error starting job {job['id']}: {e}")
+                    if recover(str(e)):
+                        break
+
+            busy = [tab for tab in tabs if tab.job is not None]
+            if not busy:
+                if leased:
+                    # Every job started this round failed; lease again
+                    continue
+                # Nothing in flight and nothing left to lease
+                break
+
+            for tab in busy:
+                try:
+                    data = collect_job(driver, tab, archive)
+                except Exception as e:
+                    print(f"✗ Error reading job {tab.job['id']}: {e}")
+                    release(tab, str(e))
+                    if recover(str(e)):
+                        break
+                    continue
+
+                if data is None:
+                    if time.perf_counter() - tab.started > tab_timeout:
+                        print(f"✗ Report for job {tab.job['id']} did not load within {tab_timeout} seconds")
+                        release(tab, 'timeout')
+                    continue
+
+                if data and ack(conn, tab.job['id'], tab.worker, data):
+                    done += 1
+                    print(f"✓ Job {tab.job['id']}: extracted {len(data)} rows "
+                          f"in {time.perf_counter() - tab.started:.1f}s")
+                    tab.job = None
+                elif data:
+                    print(f"Warning: Lease on job {tab.job['id']} was lost, result discarded")
+                    tab.job = None
+                else:
+                    print(f"✗ No data extracted for job {tab.job['id']}")
+                    release(tab, 'no data extracted')
+
+            rss = get_driver_rss(driver)
+            if rss is not None:
+                peak_rss = max(peak_rss or 0, rss)
+            time.sleep(POLL_INTERVAL)
+    finally:
+        if driver:
+            print("\nClosing browser...")
+            quit_driver(driver)
+        conn.close()
+
+    return done, failed, peak_rss
+
+
+def run_measured(commands, env=None):
+    """
+    Run worker processes to completion while sampling their combined memory.
+
+    Args:
+        commands: List of argument lists, one per process
+        env: Environment for the processes (default: inherited)
+
+    Returns:
+        tuple: (elapsed seconds, peak RSS in bytes or None)
+    """
+    start = time.perf_counter()
+    processes = [subprocess.Popen(command, stdout=subprocess.DEVNULL, env=env) for command in commands]
+    peak = None
+    stop = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not stop.is_set():
+            sizes = [get_process_tree_rss(process.pid) for process in processes]
+            if None not in sizes:
+                peak = max(peak or 0, sum(sizes))
+            stop.wait(0.5)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    for process in processes:
+        process.wait()
+    stop.set()
+    sampler.join()
+    return time.perf_counter() - start, peak
+
+
+def benchmark(report, data_type, concurrency=DEFAULT_TABS, jobs=None, delay=FIRE_INTERVAL):
+    """
+    Compare N tabs in one browser with N single-browser queue workers.
+
+    Both modes scrape the same jobs from a fresh queue, read tables with the
+    same single-call execute_script extraction and wait the same delay
+    between requests; hedging and browser recycling are off, so only tabs
+    vs browsers differ. Memory is the peak RSS of each mode's whole process
+    tree (Python, chromedriver and Chrome).
+
+    Args:
+        report: 'enrollment' or 'graduation'
+        data_type: 'school' or 'district'
+        concurrency: Number of tabs / worker processes
+        jobs: Number of jobs to scrape (default: 4 per tab)
+        delay: Seconds between requests, for both modes
+
+    Returns:
+        DataFrame: One row per mode with elapsed time, throughput and peak RSS
+    """
+    jobs = jobs or concurrency * 4
+    here = os.path.dirname(os.path.abspath(__file__))
+    modes = [
+        ('one browser per worker', [[sys.executable, os.path.join(here, 'work_queue.py'), 'worker', '{db}']] * concurrency),
+        (f'{concurrency} tabs in one browser', [[sys.executable, os.path.join(here, 'multi_tab.py'), 'worker', '{db}', str(concurrency)]])
+    ]
+
+    env = dict(os.environ, SCRAPER_EXTRACTION='script', SCRAPER_REQUEST_DELAY=str(delay),
+               SCRAPER_HEDGE='0', SCRAPER_RECYCLE='0')
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, commands in modes:
+            db_path = os.path.join(tmp, f'{len(results)}.db')
+            conn = connect(db_path)
+            enqueue(conn, [report], [data_type], limit=jobs)
+            print(f"\nRunning: {name} ({jobs} jobs)...")
+            elapsed, peak = run_measured([[arg.format(db=db_path) for arg in command] for command in commands], env)
+            done = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'done'").fetchone()[0]
+            conn.close()
+            results.append({
+                'mode': name,
+                'jobs_done': done,
+                'elapsed_s': round(elapsed, 1),
+                'jobs_per_min': round(done / elapsed * 60, 2),
+                'peak_rss_mb': round(peak / 1e6) if peak is not None else None
+            })
+    return pd.DataFrame(results)
+
+
+def main():
+    """
+    Command-line entry point for multi-tab scraping.
+    """
+    usage = [
+        "Usage: python multi_tab.py <command> [args]",
+        "  worker <queue.db> [tabs]                               scrape queued jobs with several tabs in one browser",
+        "  benchmark <report> <data_type> [concurrency] [jobs]    compare tabs with one browser per worker"
+    ]
+    if len(sys.argv) < 3 or sys.argv[1] not in ['worker', 'benchmark']:
+        print('\n'.join(usage))
+        sys.exit(1)
+
+    if sys.argv[1] == 'worker':
+        tab_count = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_TABS
+        done, failed, peak_rss = run_tab_worker(sys.argv[2], tab_count)
+        print(f"\n{'='*60}")
+        print(f"Worker finished. Done: {done}, Failed attempts: {failed}")
+        if peak_rss is not None:
+            print(f"Peak browser RSS: {peak_rss / 1e6:.0f} MB")
+        print(f"{'='*60}")
+    else:
+        if len(sys.argv) < 4:
+            print('\n'.join(usage))
+            sys.exit(1)
+        report, data_type = sys.argv[2], sys.argv[3]
+        if report not in REPORTS or data_type not in ['school', 'district']:
+            print("report must be 'enrollment' or 'graduation' and data_type 'school' or 'district'")
+            sys.exit(1)
+        concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_TABS
+        jobs = int(sys.argv[5]) if len(sys.argv) > 5 else None
+        print(benchmark(report, data_type, concurrency, jobs).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
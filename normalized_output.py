@@ -0,0 +1,395 @@
+import glob
+import os
+import sys
+import time
+import pandas as pd
+
+from data_cleaning import (
+    find_output_files,
+    parse_output_filename,
+    detect_report,
+    get_metric_columns,
+    read_raw,
+    parse_numeric
+)
+
+
+OUTPUT_ENV_VAR = 'SCRAPER_OUTPUT'
+OUTPUT_MODES = ['flat', 'normalized', 'both']
+NORMALIZED_DIRNAME = 'MA_normalized'
+ENTITIES_FILENAME = 'entities.csv'
+BREAKDOWNS_FILENAME = 'breakdowns.csv'
+FACTS_SUFFIX = '.facts.csv'
+LOCK_FILENAME = '.lock'
+LOCK_TIMEOUT = 60
+STATE_TOTAL_CODE = '00000000'
+
+ENTITY_COLUMNS = ['entity_id', 'entity_code', 'entity_name', 'level']
+BREAKDOWN_COLUMNS = ['breakdown_id', 'breakdown']
+
+
+def get_output_mode():
+    """
+    Get the output mode from the SCRAPER_OUTPUT environment variable.
+
+    Returns:
+        str: 'flat' (default), 'normalized' or 'both'
+    """
+    mode = os.environ.get(OUTPUT_ENV_VAR, 'flat').lower()
+    if mode not in OUTPUT_MODES:
+        print(f"Warning: Unknown {OUTPUT_ENV_VAR} '{mode}', using 'flat'")
+        return 'flat'
+    return mode
+
+
+def get_flat_columns(report):
+    """
+    Get the column layout of a flat scraper output file.
+    """
+    count_columns, percent_columns = get_metric_columns(report)
+    keys = ['entity_name', 'entity_code', 'breakdown']
+    if report == 'enrollment':
+        keys = ['year', 'capture_period'] + keys
+    return keys + count_columns + percent_columns
+
+
+def get_facts_filename(filename):
+    """
+    Get the fact table filename for a flat output filename.
+
+    Example: 'MA_college_enrollment_school_2024.csv' -> 'MA_college_enrollment_school_2024.facts.csv'
+    """
+    return os.path.basename(filename)[:-len('.csv')] + FACTS_SUFFIX
+
+
+def get_flat_filename(facts_filename):
+    """
+    Get the flat output filename for a fact table filename.
+    """
+    return os.path.basename(facts_filename)[:-len(FACTS_SUFFIX)] + '.csv'
+
+
+def load_dimensions(directory=NORMALIZED_DIRNAME):
+    """
+    Read the entity and breakdown dimension tables.
+
+    Returns:
+        tuple: (entities DataFrame, breakdowns DataFrame), empty if not written yet
+    """
+    entities_path = os.path.join(directory, ENTITIES_FILENAME)
+    breakdowns_path = os.path.join(directory, BREAKDOWNS_FILENAME)
+    if os.path.exists(entities_path):
+        entities = pd.read_csv(entities_path, dtype={'entity_code': str, 'entity_name': str}, keep_default_na=False)
+    else:
+        entities = pd.DataFrame(columns=ENTITY_COLUMNS).astype({'entity_id': 'int64'})
+    if os.path.exists(breakdowns_path):
+        breakdowns = pd.read_csv(breakdowns_path, dtype={'breakdown': str}, keep_default_na=False)
+    else:
+        breakdowns = pd.DataFrame(columns=BREAKDOWN_COLUMNS).astype({'breakdown_id': 'int64'})
+    return entities, breakdowns
+
+
+def write_table(df, path):
+    """
+    Write a CSV atomically so readers never see a partial table.
+    """
+    tmp_path = path + '.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+class DimensionLock:
+    """
+    Exclusive lock on the dimension tables, so scrapers running in parallel
+    do not hand out the same entity ID twice.
+    """
+
+    def __init__(self, directory, timeout=LOCK_TIMEOUT):
+        self.path = os.path.join(directory, LOCK_FILENAME)
+        self.timeout = timeout
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL))
+                return self
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Could not lock '{self.path}'; remove it if no scraper is running")
+                time.sleep(0.1)
+
+    def __exit__(self, *exc):
+        os.remove(self.path)
+
+
+def add_ids(table, keys, id_column, new_values):
+    """
+    Append unseen key combinations to a dimension table with new integer IDs.
+
+    Args:
+        table: Existing dimension table
+        keys: Key columns identifying a member
+        id_column: Name of the ID column
+        new_values: DataFrame with the key columns (and any attributes) to look up
+
+    Returns:
+        DataFrame: Dimension table including the new members
+    """
+    candidates = new_values.drop_duplicates(keys)
+    existing = candidates.merge(table[keys], on=keys, how='left', indicator=True)
+    unseen = existing[existing['_merge'] == 'left_only'].drop(columns='_merge')
+    if unseen.empty:
+        return table
+    start = int(table[id_column].max()) + 1 if len(table) else 1
+    unseen.insert(0, id_column, range(start, start + len(unseen)))
+    return pd.concat([table, unseen[table.columns]], ignore_index=True)
+
+
+def normalize(flat, report, data_type, entities, breakdowns):
+    """
+    Split a flat output frame into fact rows and dimension members.
+
+    Entities are keyed by (entity_code, entity_name): names change over the
+    years (schools get renamed), and each spelling keeps its own ID so the
+    flat files can be rebuilt exactly as published.
+
+    Args:
+        flat: Flat scraper output (raw strings, as written today)
+        report: 'enrollment' or 'graduation'
+        data_type: 'school' or 'district'
+        entities: Entity dimension table
+        breakdowns: Breakdown dimension table
+
+    Returns:
+        tuple: (facts DataFrame, updated entities, updated breakdowns)
+    """
+    count_columns, percent_columns = get_metric_columns(report)
+    flat = flat.reset_index(drop=True)
+
+    members = flat[['entity_code', 'entity_name']].copy()
+    members['level'] = data_type
+    members.loc[members['entity_code'] == STATE_TOTAL_CODE, 'level'] = 'state'
+    entities = add_ids(entities, ['entity_code', 'entity_name'], 'entity_id', members)
+    breakdowns = add_ids(breakdowns, ['breakdown'], 'breakdown_id', flat[['breakdown']])
+
+    entity_ids = flat.merge(entities[['entity_id', 'entity_code', 'entity_name']],
+                            on=['entity_code', 'entity_name'], how='left')['entity_id']
+    breakdown_ids = flat.merge(breakdowns, on='breakdown', how='left')['breakdown_id']
+
+    facts = pd.DataFrame({'entity_id': entity_ids.to_numpy(), 'breakdown_id': breakdown_ids.to_numpy()})
+    if report == 'enrollment':
+        facts['capture_period'] = flat['capture_period'].to_numpy()
+
+    values, unparseable = parse_numeric(flat[count_columns + percent_columns].astype(str))
+    if unparseable.any().any():
+        print(f"  Warning: {int(unparseable.sum().sum())} non-numeric metric cells stored as blank")
+    for column in count_columns:
+        facts[column] = values[column].round().astype('Int64').to_numpy()
+    for column in percent_columns:
+        facts[column] = values[column].to_numpy()
+    return facts, entities, breakdowns
+
+
+def denormalize(facts, report, year, entities, breakdowns):
+    """
+    Rebuild the flat output layout from a fact table.
+
+    Counts are written with thousands separators and percentages with one
+    decimal, as the report pages show them; blanks stay blank.
+
+    Args:
+        facts: Fact table from normalize()
+        report: 'enrollment' or 'graduation'
+        year: Output year (enrollment files only)
+        entities: Entity dimension table
+        breakdowns: Breakdown dimension table
+
+    Returns:
+        DataFrame: Flat frame of strings, in fact table order
+    """
+    count_columns, percent_columns = get_metric_columns(report)
+    flat = facts.merge(entities[['entity_id', 'entity_code', 'entity_name']], on='entity_id', how='left')
+    flat = flat.merge(breakdowns, on='breakdown_id', how='left')
+    if report == 'enrollment':
+        flat['year'] = str(year)
+
+    for column, fmt in [(column, '{:,.0f}') for column in count_columns] + [(column, '{:.1f}') for column in percent_columns]:
+        values = flat[column].astype('float64')
+        flat[column] = values.map(fmt.format).where(values.notna(), '')
+    return flat[get_flat_columns(report)]
+
+
+def read_facts(path):
+    """
+    Read a fact table written by write_normalized().
+    """
+    report = detect_report(get_flat_filename(path))
+    count_columns, _ = get_metric_columns(report)
+    dtypes = {column: 'Int64' for column in count_columns}
+    dtypes['capture_period'] = str
+    return pd.read_csv(path, dtype=dtypes)
+
+
+def write_normalized(flat, filename, directory=NORMALIZED_DIRNAME):
+    """
+    Write one scraper output in normalized form.
+
+    The entity and breakdown tables are shared by all outputs in the
+    directory and only ever grow, so IDs stay stable across runs.
+
+    Args:
+        flat: Flat scraper output DataFrame
+        filename: The flat output filename (determines report, data type and year)
+        directory: Directory for the normalized tables
+
+    Returns:
+        str: Path of the fact table
+    """
+    report, data_type, _ = parse_output_filename(filename)
+    os.makedirs(directory, exist_ok=True)
+    with DimensionLock(directory):
+        entities, breakdowns = load_dimensions(directory)
+        facts, entities, breakdowns = normalize(flat, report, data_type, entities, breakdowns)
+        write_table(entities, os.path.join(directory, ENTITIES_FILENAME))
+        write_table(breakdowns, os.path.join(directory, BREAKDOWNS_FILENAME))
+    facts_path = os.path.join(directory, get_facts_filename(filename))
+    write_table(facts, facts_path)
+    return facts_path
+
+
+def save_output(df, filename, mode=None):
+    """
+    Save a scraper result as a flat CSV, in normalized form, or both.
+
+    Args:
+        df: Flat scraper output DataFrame
+        filename: Flat output filename
+        mode: 'flat', 'normalized' or 'both' (default: SCRAPER_OUTPUT environment variable)
+
+    Returns:
+        list: Paths written
+    """
+    mode = mode or get_output_mode()
+    written = []
+    if mode in ['flat', 'both']:
+        # Replace an existing file in one step, e.g. when a slice is repaired
+        tmp_path = filename + '.tmp'
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, filename)
+        written.append(filename)
+    if mode in ['normalized', 'both']:
+        directory = os.path.join(os.path.dirname(filename), NORMALIZED_DIRNAME)
+        written.append(write_normalized(df, filename, directory))
+    return written
+
+
+def normalize_directory(directory='.', output_dir=None):
+    """
+    Write normalized tables for every flat output file in a directory.
+
+    Returns:
+        list: Fact table paths
+    """
+    output_dir = output_dir or os.path.join(directory, NORMALIZED_DIRNAME)
+    return [write_normalized(read_raw(path), path, output_dir) for path in find_output_files(directory)]
+
+
+def flatten(directory=NORMALIZED_DIRNAME, output_dir='.'):
+    """
+    Rebuild the flat output files from normalized tables.
+
+    Returns:
+        list: Flat file paths
+    """
+    entities, breakdowns = load_dimensions(directory)
+    written = []
+    for path in sorted(glob.glob(os.path.join(directory, '*' + FACTS_SUFFIX))):
+        filename = get_flat_filename(path)
+        report, _, year = parse_output_filename(filename)
+        flat = denormalize(read_facts(path), report, year, entities, breakdowns)
+        output_path = os.path.join(output_dir, filename)
+        flat.to_csv(output_path, index=False)
+        written.append(output_path)
+    return written
+
+
+def check(directory='.'):
+    """
+    Verify that every flat output file survives a normalize/flatten round trip.
+
+    Rows, keys and blanks must match exactly; numbers must parse to the same
+    values (the site is not consistent about '1,234' vs '1234' or '100' vs
+    '100.0', so the text itself may differ).
+
+    Returns:
+        DataFrame: One row per file with sizes and the round-trip result
+    """
+    import tempfile
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        normalize_directory(directory, tmp)
+        entities, breakdowns = load_dimensions(tmp)
+        dimension_bytes = sum(os.path.getsize(os.path.join(tmp, name)) for name in [ENTITIES_FILENAME, BREAKDOWNS_FILENAME])
+        for path in find_output_files(directory):
+            report, _, year = parse_output_filename(path)
+            facts_path = os.path.join(tmp, get_facts_filename(path))
+            raw = read_raw(path)[get_flat_columns(report)]
+            rebuilt = denormalize(read_facts(facts_path), report, year, entities, breakdowns)
+
+            count_columns, percent_columns = get_metric_columns(report)
+            metrics = count_columns + percent_columns
+            keys = [column for column in raw.columns if column not in metrics]
+            original_values, _ = parse_numeric(raw[metrics])
+            rebuilt_values, _ = parse_numeric(rebuilt[metrics])
+            same = (len(raw) == len(rebuilt)
+                    and raw[keys].equals(rebuilt[keys])
+                    and original_values.equals(rebuilt_values))
+            results.append({
+                'file': os.path.basename(path),
+                'rows': len(raw),
+                'flat_kb': round(os.path.getsize(path) / 1024),
+                'facts_kb': round(os.path.getsize(facts_path) / 1024),
+                'round_trip': 'ok' if same else 'MISMATCH'
+            })
+    results = pd.DataFrame(results)
+    results.attrs['dimension_kb'] = round(dimension_bytes / 1024)
+    return results
+
+
+def main():
+    """
+    Command-line entry point for normalized output.
+    """
+    usage = [
+        "Usage: python normalized_output.py <command> [args]",
+        "  normalize [directory] [output_dir]    write normalized tables for existing flat CSVs",
+        "  flatten [normalized_dir] [output_dir]  rebuild the flat CSVs from normalized tables",
+        "  check [directory]                      verify the round trip and compare sizes"
+    ]
+    if len(sys.argv) < 2 or sys.argv[1] not in ['normalize', 'flatten', 'check']:
+        print('\n'.join(usage))
+        sys.exit(1)
+
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == 'normalize':
+        directory = args[0] if args else '.'
+        paths = normalize_directory(directory, args[1] if len(args) > 1 else None)
+        print(f"✓ Normalized {len(paths)} files into '{os.path.dirname(paths[0]) if paths else directory}'")
+    elif command == 'flatten':
+        paths = flatten(args[0] if args else NORMALIZED_DIRNAME, args[1] if len(args) > 1 else '.')
+        for path in paths:
+            print(f"✓ Data saved to '{path}'")
+    else:
+        results = check(args[0] if args else '.')
+        print(results.to_string(index=False))
+        print(f"\nDimension tables: {results.attrs['dimension_kb']} KB")
+        print(f"Flat total: {results['flat_kb'].sum()} KB, "
+              f"normalized total: {results['facts_kb'].sum() + results.attrs['dimension_kb']} KB")
+        if (results['round_trip'] != 'ok').any():
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+import os
+import pickle
+import sys
+import time
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from data_cleaning import (
+    find_output_files,
+    parse_output_filename,
+    process_file,
+    get_metric_columns
+)
+
+
+PANEL_CACHE_FILENAME = 'MA_panel_{data_type}.pkl'
+PANEL_KEYS = ['entity_code', 'breakdown']
+PANEL_CACHE_VERSION = 1
+
+
+def get_input_signature(paths):
+    """
+    Fingerprint the input files so the cached panel can be invalidated.
+
+    Args:
+        paths: List of scraper output CSV paths
+
+    Returns:
+        list: Sorted (filename, size, mtime_ns) tuples
+    """
+    signature = []
+    for path in sorted(paths):
+        stat = os.stat(path)
+        signature.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def unify_categories(frames, column):
+    """
+    Give a column the same categorical dtype in every frame so joins and
+    concatenation stay on integer codes.
+
+    Args:
+        frames: List of DataFrames containing the column
+        column: Column name
+    """
+    categories = union_categoricals(
+        [pd.Categorical(frame[column]) for frame in frames],
+        sort_categories=True
+    ).categories
+    dtype = pd.CategoricalDtype(categories)
+    for frame in frames:
+        frame[column] = frame[column].astype(dtype)
+
+
+def pivot_enrollment(frames):
+    """
+    Stack the enrollment years and pivot year/capture_period into columns.
+
+    Args:
+        frames: List of typed enrollment DataFrames
+
+    Returns:
+        DataFrame: Indexed by (entity_code, breakdown), one column per metric, year and capture period
+    """
+    count_columns, percent_columns = get_metric_columns('enrollment')
+    metrics = count_columns + percent_columns
+    stacked = pd.concat(frames, ignore_index=True)
+    stacked['capture_period'] = stacked['capture_period'].astype('category')
+
+    wide = stacked.set_index(PANEL_KEYS + ['year', 'capture_period'])[metrics].unstack(['year', 'capture_period'])
+    wide = wide.sort_index(axis=1, level=['year', 'capture_period'], sort_remaining=False)
+    wide.columns = [f"{metric} {year} {period}" for metric, year, period in wide.columns]
+    # unstack() turns nullable ints into objects when it has to fill gaps
+    for column in wide.columns:
+        if '(#)' in column:
+            wide[column] = wide[column].astype('Int64')
+        else:
+            wide[column] = wide[column].astype('float64')
+    return wide
+
+
+def build_panel(paths, data_type):
+    """
+    Join every enrollment year and the graduation rates into one wide table.
+
+    Args:
+        paths: List of scraper output CSV paths
+        data_type: 'school' or 'district'; only files for this level are used
+
+    Returns:
+        DataFrame: One row per (entity_code, breakdown) with entity_name and all metrics as columns
+    """
+    enrollment = []
+    graduation = []
+    for path in paths:
+        report, file_data_type, year = parse_output_filename(path)
+        if file_data_type != data_type:
+            continue
+        _, df, _ = process_file(path)
+        if report == 'enrollment':
+            enrollment.append(df)
+        else:
+            df.columns = [column if column in PANEL_KEYS or column == 'entity_name' else f"{column} {year}"
+                          for column in df.columns]
+            graduation.append(df)
+
+    frames = enrollment + graduation
+    if not frames:
+        return pd.DataFrame()
+    unify_categories(frames, 'entity_code')
+    unify_categories(frames, 'breakdown')
+
+    # Names taken from the most recent file an entity appears in
+    names = pd.concat([df[['entity_code', 'entity_name']] for df in frames], ignore_index=True)
+    names = names.drop_duplicates('entity_code', keep='last').set_index('entity_code')['entity_name']
+
+    parts = []
+    if enrollment:
+        parts.append(pivot_enrollment(enrollment))
+    for df in graduation:
+        parts.append(df.drop(columns='entity_name').set_index(PANEL_KEYS))
+
+    panel = parts[0]
+    for part in parts[1:]:
+        panel = panel.join(part, how='outer')
+
+    panel = panel.reset_index()
+    for column in PANEL_KEYS:
+        panel[column] = panel[column].astype(frames[0][column].dtype)
+    panel.insert(1, 'entity_name', panel['entity_code'].map(names).astype(str))
+    return panel.sort_values(PANEL_KEYS, ignore_index=True)
+
+
+def load_panel(data_type, directory='.', rebuild=False):
+    """
+    Return the panel for a level, rebuilding it only if an input file changed.
+
+    Args:
+        data_type: 'school' or 'district'
+        directory: Directory containing the scraper outputs
+        rebuild: Ignore the cache and rebuild
+
+    Returns:
+        DataFrame: The panel from build_panel()
+    """
+    paths = [path for path in find_output_files(directory)
+             if parse_output_filename(path)[1] == data_type]
+    signature = get_input_signature(paths)
+    cache_path = os.path.join(directory, PANEL_CACHE_FILENAME.format(data_type=data_type))
+
+    if not rebuild and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('version') == PANEL_CACHE_VERSION and cached.get('inputs') == signature:
+                return cached['panel']
+        except Exception as e:
+            print(f"Warning: Could not read panel cache '{cache_path}': {e}")
+
+    panel = build_panel(paths, data_type)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': PANEL_CACHE_VERSION, 'inputs': signature, 'panel': panel}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return panel
+
+
+def main():
+    """
+    Build (or load from cache) the longitudinal panel for one level.
+    """
+    if len(sys.argv) < 2:
+        print("Usage: python panel_builder.py <data_type> [directory] [--rebuild]")
+        print("  data_type: 'school' or 'district'")
+        sys.exit(1)
+
+    data_type = sys.argv[1]
+    if data_type not in ['school', 'district']:
+        print('Unsupported data type. Please use "school" or "district" as an argument')
+        sys.exit(1)
+
+    args = [arg for arg in sys.argv[2:] if arg != '--rebuild']
+    directory = args[0] if args else '.'
+    rebuild = '--rebuild' in sys.argv
+
+    start = time.perf_counter()
+    panel = load_panel(data_type, directory, rebuild=rebuild)
+    elapsed = time.perf_counter() - start
+
+    print(f"Panel shape: {panel.shape}")
+    print(f"Memory usage: {panel.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+    print(f"Elapsed: {elapsed:.2f}s")
+    print(panel.head())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+from collections import Counter
+import os
+import sys
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from snapshot_archive import TABLE_IDS
+from table_script import get_table_cells
+
+
+PREFLIGHT_ENV_VAR = 'SCRAPER_PREFLIGHT'
+PROBE_TIMEOUT = 15
+VIEW_REPORT_TEXT = 'View Report'
+# The exact locator the scrapers click
+VIEW_REPORT_XPATH = f'//button[text()="{VIEW_REPORT_TEXT}"]'
+DATA_TYPES = ['school', 'district']
+
+# Everything the scrapers rely on, read in a single round-trip
+PAGE_SCRIPT = """
+const selects = {};
+document.querySelectorAll('select').forEach(select => {
+    selects[select.name] = Array.from(select.options, option => [option.value, option.text.trim()]);
+});
+return {
+    selects: selects,
+    buttons: Array.from(document.querySelectorAll('button'), button => button.textContent.trim()),
+    tables: Array.from(document.querySelectorAll('table[id]'), table => table.id)
+};
+"""
+
+
+def get_expected_structure(report, data_type=None):
+    """
+    Collect the dropdowns, values and table layout a scraper depends on.
+
+    Args:
+        report: 'enrollment' or 'graduation'
+        data_type: 'school' or 'district'; the School report type is only
+            required for school runs (district runs keep the page default)
+
+    Returns:
+        dict: url, dropdowns (name -> (expected {value: text}, key the scraper selects by)),
+              table_id and column_count; a text of None means only the value matters
+    """
+    # Imported here because the scrapers import this module
+    import enrollment_scraper
+    import graduation_rate_scraper
+
+    if report == 'enrollment':
+        scraper = enrollment_scraper
+        dropdowns = {
+            scraper.SUBGROUP_DROPDOWN_NAME: (scraper.SUBGROUP_DROPDOWN_VALUES, 'value'),
+            # select_year() selects by visible text ('2023-24')
+            scraper.YEAR_DROPDOWN_NAME: (scraper.YEAR_DROPDOWN_VALUES, 'text'),
+            scraper.ATTEND_RANGE_DROPDOWN_NAME: (scraper.ATTEND_RANGE_DROPDOWN_VALUES, 'value')
+        }
+    else:
+        scraper = graduation_rate_scraper
+        dropdowns = {
+            scraper.DROPDOWN_NAME: (scraper.DROPDOWN_VALUES, 'value')
+        }
+    if data_type == 'school':
+        # select_school() selects this option
+        dropdowns[scraper.DATA_TYPE_NAME] = ({'School': None}, 'value')
+    return {
+        'url': scraper.URL,
+        'dropdowns': dropdowns,
+        'table_id': TABLE_IDS[report],
+        'column_count': scraper.COLUMN_COUNT
+    }
+
+
+def compare_dropdown(name, expected, key, options):
+    """
+    Diff the options a scraper expects against the ones on the page.
+
+    Args:
+        name: Dropdown name
+        expected: {value: text} the scraper uses
+        key: 'value' or 'text', whichever the scraper selects by
+        options: [value, text] pairs found on the page
+
+    Returns:
+        tuple: (errors, notes) as lists of strings
+    """
+    found = dict(options)
+    errors = []
+    notes = []
+    if key == 'value':
+        missing = [f"{value} ({text})" if text else value for value, text in expected.items() if value not in found]
+        extra = [f"{value} ({text})" for value, text in found.items() if value not in expected]
+        relabeled = [f"{value}: '{text}' -> '{found[value]}'" for value, text in expected.items()
+                     if text is not None and value in found and found[value] != text]
+    else:
+        texts = set(found.values())
+        missing = [text for text in expected.values() if text not in texts]
+        extra = [text for text in found.values() if text not in expected.values()]
+        relabeled = []
+
+    if missing:
+        errors.append(f"Dropdown '{name}': missing {', '.join(missing)}")
+    if relabeled:
+        notes.append(f"Dropdown '{name}': labels changed {'; '.join(relabeled)}")
+    # Only worth mentioning where the scraper means to cover every option
+    if extra and all(text is not None for text in expected.values()):
+        notes.append(f"Dropdown '{name}': not scraped {', '.join(extra)}")
+    return errors, notes
+
+
+def probe(driver, report, data_type=None, wait_timeout=PROBE_TIMEOUT):
+    """
+    Check that the report page still has the structure the scraper expects.
+
+    Loads the page once, compares every dropdown and option the scraper
+    selects, looks for the View Report button, then runs one report with the
+    page defaults and checks the table and its column count.
+
+    Args:
+        driver: Selenium WebDriver instance
+        report: 'enrollment' or 'graduation'
+        data_type: 'school' or 'district' (see get_expected_structure())
+        wait_timeout: Maximum time to wait for the page and the report (seconds)
+
+    Returns:
+        tuple: (errors, notes) as lists of strings; any error means a full run would fail
+    """
+    expected = get_expected_structure(report, data_type)
+    errors = []
+    notes = []
+
+    driver.get(expected['url'])
+    first_dropdown = next(iter(expected['dropdowns']))
+    try:
+        WebDriverWait(driver, wait_timeout).until(
+            EC.presence_of_element_located((By.TAG_NAME, 'select'))
+        )
+    except TimeoutException:
+        return [f"No dropdowns found on {expected['url']} within {wait_timeout} seconds"], notes
+
+    page = driver.execute_script(PAGE_SCRIPT)
+    for name, (values, key) in expected['dropdowns'].items():
+        if name not in page['selects']:
+            errors.append(f"Dropdown '{name}' not found; dropdowns on page: {', '.join(page['selects']) or 'none'}")
+            continue
+        dropdown_errors, dropdown_notes = compare_dropdown(name, values, key, page['selects'][name])
+        errors.extend(dropdown_errors)
+        notes.extend(dropdown_notes)
+
+    buttons = driver.find_elements(By.XPATH, VIEW_REPORT_XPATH)
+    if not buttons:
+        errors.append(f"Button '{VIEW_REPORT_TEXT}' not found with {VIEW_REPORT_XPATH}; "
+                      f"buttons on page: {', '.join(repr(text) for text in page['buttons']) or 'none'}")
+        return errors, notes
+    if first_dropdown not in page['selects']:
+        # Already failing; no need to wait for a report
+        return errors, notes
+
+    buttons[0].click()
+    table_id = expected['table_id']
+    try:
+        WebDriverWait(driver, wait_timeout).until(EC.presence_of_element_located((By.ID, table_id)))
+    except TimeoutException:
+        tables = driver.execute_script(PAGE_SCRIPT)['tables']
+        errors.append(f"Table '{table_id}' did not appear within {wait_timeout} seconds; "
+                      f"tables on page: {', '.join(tables) or 'none'}")
+        return errors, notes
+
+    rows = [row for row in get_table_cells(driver, table_id) or [] if row and row[0]]
+    if not rows:
+        errors.append(f"Table '{table_id}' has no data rows")
+        return errors, notes
+    counts = Counter(len(row) for row in rows)
+    cells, _ = counts.most_common(1)[0]
+    if cells < expected['column_count']:
+        errors.append(f"Table '{table_id}' rows have {cells} cells, expected {expected['column_count']}")
+    elif cells > expected['column_count']:
+        notes.append(f"Table '{table_id}' rows have {cells} cells, only the first {expected['column_count']} are scraped")
+    return errors, notes
+
+
+def run_preflight(driver, report, data_type=None, wait_timeout=PROBE_TIMEOUT):
+    """
+    Probe a report page and print the differences found.
+
+    Returns:
+        bool: True if the scraper can run
+    """
+    print(f"Preflight check for the {report} report{f' ({data_type})' if data_type else ''}...")
+    errors, notes = probe(driver, report, data_type, wait_timeout)
+    for note in notes:
+        print(f"  Note: {note}")
+    for error in errors:
+        print(f"  ✗ {error}")
+    if errors:
+        print(f"✗ Preflight failed: the {report} page changed, not starting the run")
+        return False
+    print("✓ Preflight passed")
+    return True
+
+
+def preflight_enabled():
+    """
+    Check the SCRAPER_PREFLIGHT environment variable (on unless set to 0).
+    """
+    return os.environ.get(PREFLIGHT_ENV_VAR, '').lower() not in ['0', 'false', 'no', 'off']
+
+
+def main():
+    """
+    Probe one or both report pages without scraping.
+
+    The data type defaults to school, which checks every dropdown.
+    """
+    from selenium import webdriver
+
+    args = sys.argv[1:]
+    reports = [arg for arg in args if arg in TABLE_IDS]
+    data_types = [arg for arg in args if arg in DATA_TYPES]
+    if len(reports) + len(data_types) != len(args) or len(data_types) > 1:
+        print("Usage: python preflight.py [enrollment] [graduation] [school|district]")
+        sys.exit(1)
+    reports = reports or list(TABLE_IDS)
+    data_type = data_types[0] if data_types else 'school'
+
+    driver = webdriver.Chrome()
+    try:
+        results = [run_preflight(driver, report, data_type) for report in reports]
+    finally:
+        driver.quit()
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,434 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from data_cleaning import find_output_files, parse_output_filename, process_file
+
+
+DEFAULT_PORT = 8765
+CACHE_SIZE = 1024
+RELOAD_INTERVAL = 2.0
+INDEXED_COLUMNS = ['entity_code', 'breakdown', 'year', 'data_type', 'capture_period']
+AGGREGATIONS = ['mean', 'sum', 'min', 'max', 'count', 'median']
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache of query results.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+class ReportIndex:
+    """
+    One report's rows from all output files, with position indexes.
+
+    Each index maps a value to the sorted row positions holding it, so a
+    filter is a dictionary lookup and combined filters are intersections of
+    small candidate sets. Entity names are kept sorted for prefix lookups.
+    Rows are also pre-converted to dictionaries so plain lookups never touch
+    pandas.
+    """
+
+    def __init__(self, frames):
+        self.df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        self.records = to_records(self.df)
+        self.indexes = {}
+        self.values = {}
+        for column in INDEXED_COLUMNS:
+            if column in self.df:
+                values = self.df[column].astype(str)
+                self.values[column] = values.to_numpy(dtype=object)
+                groups = self.df.groupby(values, observed=True).indices
+                self.indexes[column] = {key: np.sort(positions) for key, positions in groups.items()}
+
+        names = self.df['entity_name'].str.lower() if len(self.df) else pd.Series(dtype=str)
+        self.lower_names = names.to_numpy(dtype=object)
+        self.name_positions = names.groupby(names).indices if len(self.df) else {}
+        self.names = sorted(self.name_positions)
+
+    def positions_for_prefix(self, prefix):
+        """
+        Row positions of entities whose name starts with a prefix (case-insensitive).
+        """
+        prefix = prefix.lower()
+        matches = []
+        idx = bisect_left(self.names, prefix)
+        while idx < len(self.names) and self.names[idx].startswith(prefix):
+            matches.append(self.name_positions[self.names[idx]])
+            idx += 1
+        if not matches:
+            return np.array([], dtype=np.intp)
+        return np.sort(np.concatenate(matches))
+
+    def select(self, filters, name_prefix=None):
+        """
+        Get the row positions matching all filters.
+
+        The most selective index provides the candidate rows; the remaining
+        filters are then checked on those candidates only.
+
+        Args:
+            filters: Dict of indexed column -> list of accepted values
+            name_prefix: Optional entity_name prefix
+
+        Returns:
+            ndarray: Sorted row positions, or None when no filter was given (all rows)
+        """
+        for column in filters:
+            if column not in self.indexes:
+                raise ValueError(f"Column '{column}' is not indexed for this report")
+        if not filters and not name_prefix:
+            return None
+
+        sizes = {column: sum(len(self.indexes[column].get(value, ())) for value in values)
+                 for column, values in filters.items()}
+        if name_prefix:
+            selected = self.positions_for_prefix(name_prefix)
+            remaining = list(filters)
+        else:
+            best = min(sizes, key=sizes.get)
+            arrays = [self.indexes[best][value] for value in filters[best] if value in self.indexes[best]]
+            if not arrays:
+                return np.array([], dtype=np.intp)
+            selected = arrays[0] if len(arrays) == 1 else np.sort(np.concatenate(arrays))
+            remaining = [column for column in filters if column != best]
+
+        for column in sorted(remaining, key=sizes.get):
+            if not len(selected):
+                break
+            selected = selected[np.isin(self.values[column][selected], filters[column])]
+        return selected
+
+
+def to_records(df):
+    """
+    Convert a frame to JSON-friendly records (missing values become None).
+    """
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+class QueryService:
+    """
+    Serve filtered and aggregated queries over all scraper outputs from memory.
+
+    Files are loaded once; a background thread reloads any file the scrapers
+    rewrite and rebuilds that report's indexes. Results are cached per query
+    until the next reload.
+    """
+
+    def __init__(self, directory='.', cache_size=CACHE_SIZE):
+        self.directory = directory
+        self.cache = LRUCache(cache_size)
+        self.lock = threading.Lock()
+        self.frames = {}
+        self.mtimes = {}
+        self.reports = {}
+        self.version = 0
+        self.reload()
+
+    def reload(self):
+        """
+        Load new or changed output files and rebuild the affected report indexes.
+
+        Returns:
+            list: Paths that were (re)loaded
+        """
+        paths = find_output_files(self.directory)
+        changed = []
+        for path in paths:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            if self.mtimes.get(path) != mtime:
+                changed.append((path, mtime))
+        removed = [path for path in self.frames if path not in paths]
+        if not changed and not removed:
+            return []
+
+        frames = dict(self.frames)
+        mtimes = dict(self.mtimes)
+        for path in removed:
+            frames.pop(path, None)
+            mtimes.pop(path, None)
+        for path, mtime in changed:
+            try:
+                report, data_type, year = parse_output_filename(path)
+                _, df, _ = process_file(path)
+            except Exception as e:
+                # Probably caught mid-write; try again on the next poll
+                print(f"Warning: Could not load '{path}': {e}")
+                continue
+            df['data_type'] = data_type
+            if 'year' not in df:
+                df['year'] = year
+            frames[path] = df
+            mtimes[path] = mtime
+
+        affected = {parse_output_filename(path)[0] for path, _ in changed} | \
+                   {parse_output_filename(path)[0] for path in removed}
+        reports = dict(self.reports)
+        for report in affected:
+            report_frames = [df for path, df in sorted(frames.items()) if parse_output_filename(path)[0] == report]
+            reports[report] = ReportIndex(report_frames)
+
+        with self.lock:
+            self.frames = frames
+            self.mtimes = mtimes
+            self.reports = reports
+            self.version += 1
+        self.cache.clear()
+        return [path for path, _ in changed] + removed
+
+    def watch(self, interval=RELOAD_INTERVAL):
+        """
+        Start a daemon thread that reloads files as soon as they change.
+        """
+        def poll():
+            while True:
+                time.sleep(interval)
+                for path in self.reload():
+                    print(f"Reloaded '{os.path.basename(path)}'")
+
+        thread = threading.Thread(target=poll, daemon=True)
+        thread.start()
+        return thread
+
+    def query(self, report, filters=None, name_prefix=None, columns=None,
+              group_by=None, metrics=None, agg='mean', limit=None):
+        """
+        Run a filtered (and optionally aggregated) query.
+
+        Args:
+            report: 'enrollment' or 'graduation'
+            filters: Dict of indexed column -> value or list of values
+                (entity_code, breakdown, year, data_type, capture_period)
+            name_prefix: Only entities whose name starts with this (case-insensitive)
+            columns: Columns to return (default: all)
+            group_by: Column or list of columns to aggregate by
+            metrics: Columns to aggregate (default: all numeric columns); text
+                columns only with agg='count'
+            agg: One of AGGREGATIONS
+            limit: Maximum number of rows to return
+
+        Returns:
+            list: Result rows as dictionaries
+        """
+        filters = {column: [str(v) for v in (values if isinstance(values, (list, tuple)) else [values])]
+                   for column, values in (filters or {}).items()}
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+        key = (self.version, report, tuple(sorted((c, tuple(v)) for c, v in filters.items())),
+               name_prefix, tuple(columns or ()), tuple(group_by), tuple(metrics or ()), agg, limit)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        index = self.reports.get(report)
+        if index is None:
+            raise ValueError(f"Unknown report '{report}'; loaded: {sorted(self.reports)}")
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation '{agg}'; use one of {AGGREGATIONS}")
+
+        positions = index.select(filters, name_prefix)
+        if not group_by:
+            if positions is None:
+                positions = range(len(index.records))
+            if limit is not None:
+                positions = positions[:limit]
+            if columns:
+                records = [{column: index.records[i][column] for column in columns} for i in positions]
+            else:
+                records = [index.records[i] for i in positions]
+            self.cache.put(key, records)
+            return records
+
+        df = index.df if positions is None else index.df.iloc[positions]
+        unknown = [column for column in group_by + list(metrics or []) if column not in df]
+        if unknown:
+            raise ValueError(f"Unknown columns for {report}: {unknown}")
+        if metrics:
+            values = list(metrics)
+            # Only counting works on text columns
+            text = [column for column in values if not pd.api.types.is_numeric_dtype(df[column])]
+            if text and agg != 'count':
+                raise ValueError(f"Cannot compute '{agg}' of non-numeric columns {text}; use agg=count")
+        else:
+            values = [column for column in df.select_dtypes('number').columns if column not in group_by]
+        result = df.groupby(group_by, observed=True)[values].agg(agg).reset_index()
+        if limit is not None:
+            result = result.head(limit)
+
+        records = to_records(result)
+        self.cache.put(key, records)
+        return records
+
+    def stats(self):
+        """
+        Describe the loaded data and cache usage.
+        """
+        return {
+            'files': len(self.frames),
+            'rows': {report: len(index.df) for report, index in self.reports.items()},
+            'version': self.version,
+            'cache': {'entries': len(self.cache.items), 'hits': self.cache.hits, 'misses': self.cache.misses}
+        }
+
+
+def parse_query_params(params):
+    """
+    Turn query-string parameters into QueryService.query() arguments.
+
+    Repeated or comma-separated values are accepted for filters, columns,
+    group_by and metrics, e.g. ?breakdown=Female&breakdown=Male&year=2023,2024
+    """
+    def values(name):
+        items = []
+        for value in params.get(name, []):
+            items.extend(part for part in value.split(',') if part)
+        return items
+
+    filters = {column: values(column) for column in INDEXED_COLUMNS if values(column)}
+    # Breakdown names themselves contain commas, so they are never split
+    if 'breakdown' in params:
+        filters['breakdown'] = params['breakdown']
+    return {
+        'filters': filters,
+        'name_prefix': params.get('name_prefix', [None])[0],
+        'columns': values('columns') or None,
+        'group_by': values('group_by') or None,
+        'metrics': params.get('metric') or None,
+        'agg': params.get('agg', ['mean'])[0],
+        'limit': int(params['limit'][0]) if 'limit' in params else None
+    }
+
+
+def make_handler(service):
+    """
+    Build an HTTP request handler bound to a QueryService.
+
+    Routes:
+        GET /health            loaded files, row counts and cache statistics
+        GET /query/<report>    filtered/aggregated rows as JSON
+    """
+    class QueryHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split('/') if part]
+            if parts == ['health']:
+                self.send_json(200, service.stats())
+                return
+            if len(parts) != 2 or parts[0] != 'query':
+                self.send_json(404, {'error': 'Use /health or /query/<report>'})
+                return
+            try:
+                start = time.perf_counter()
+                rows = service.query(parts[1], **parse_query_params(parse_qs(url.query)))
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.send_json(200, {'rows': rows, 'count': len(rows), 'elapsed_ms': round(elapsed_ms, 3)})
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryHandler
+
+
+def main():
+    """
+    Serve queries over HTTP, or run a single query from the command line.
+    """
+    usage = [
+        "Usage: python query_service.py <command> [args]",
+        "  serve [directory] [port]                      start the HTTP service (default port 8765)",
+        "  query <report> [directory] [key=value ...]    run one query and print the result",
+        "",
+        "Query keys: entity_code, breakdown, year, data_type, capture_period, name_prefix,",
+        "            columns, group_by, metric, agg, limit"
+    ]
+    if len(sys.argv) < 2 or sys.argv[1] not in ['serve', 'query']:
+        print('\n'.join(usage))
+        sys.exit(1)
+
+    if sys.argv[1] == 'serve':
+        directory = sys.argv[2] if len(sys.argv) > 2 else '.'
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_PORT
+        start = time.perf_counter()
+        service = QueryService(directory)
+        print(f"Loaded {len(service.frames)} files in {time.perf_counter() - start:.2f}s")
+        service.watch()
+        server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(service))
+        print(f"Serving on http://127.0.0.1:{port}/query/<report>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nShutting down...")
+            server.server_close()
+        return
+
+    if len(sys.argv) < 3:
+        print('\n'.join(usage))
+        sys.exit(1)
+    report = sys.argv[2]
+    args = sys.argv[3:]
+    directory = '.'
+    if args and '=' not in args[0]:
+        directory = args.pop(0)
+    params = {}
+    for arg in args:
+        name, _, value = arg.partition('=')
+        params.setdefault(name, []).append(value)
+
+    service = QueryService(directory)
+    start = time.perf_counter()
+    rows = service.query(report, **parse_query_params(params))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(pd.DataFrame(rows).to_string(index=False))
+    print(f"\n{len(rows)} rows in {elapsed_ms:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import sys
+import time
+import pandas as pd
+import zstandard
+from bs4 import BeautifulSoup, SoupStrainer
+
+from normalized_output import save_output
+
+
+ARCHIVE_ENV_VAR = 'SCRAPER_ARCHIVE'
+MANIFEST_FILENAME = 'manifest.jsonl'
+OBJECTS_DIRNAME = 'objects'
+COMPRESSION_LEVEL = 10
+
+TABLE_IDS = {
+    'enrollment': 'teacherprogram',
+    'graduation': 'tblStateReport'
+}
+
+
+class SnapshotArchive:
+    """
+    Content-addressed store of raw report pages.
+
+    Each page is zstd-compressed and stored once under its SHA-256, in
+    objects/<first two hex digits>/<hash>.zst. Every capture appends a line
+    to manifest.jsonl with the form state that produced the page, so the
+    CSV outputs can be rebuilt later without a browser.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        os.makedirs(os.path.join(directory, OBJECTS_DIRNAME), exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, OBJECTS_DIRNAME, digest[:2], f'{digest}.zst')
+
+    def save(self, html, report, data_type, subgroup, year='', attend_range=''):
+        """
+        Store a page and record the form state it was captured with.
+
+        Args:
+            html: Page source
+            report: 'enrollment' or 'graduation'
+            data_type: 'school' or 'district'
+            subgroup: Subgroup value code
+            year: Year string (e.g., '2019-20'), enrollment only
+            attend_range: Attend range value code, enrollment only
+
+        Returns:
+            str: SHA-256 of the page
+        """
+        raw = html.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.object_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(raw))
+            os.replace(tmp_path, path)
+
+        record = {
+            'report': report,
+            'data_type': data_type,
+            'year': year or '',
+            'attend_range': attend_range or '',
+            'subgroup': subgroup,
+            'sha256': digest,
+            'bytes': len(raw),
+            'captured_at': time.time()
+        }
+        # Single appended line, so concurrent scrapers can share an archive
+        with open(self.manifest_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        return digest
+
+    def load(self, digest):
+        """
+        Return the page stored under a hash.
+        """
+        with open(self.object_path(digest), 'rb') as f:
+            return zstandard.ZstdDecompressor().decompress(f.read()).decode('utf-8')
+
+    def read_manifest(self):
+        """
+        Return the latest capture for each form state.
+
+        Returns:
+            list: Manifest records, one per (report, data_type, year, attend_range, subgroup)
+        """
+        latest = {}
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = (record['report'], record['data_type'], record['year'], record['attend_range'], record['subgroup'])
+                latest[key] = record
+        return list(latest.values())
+
+
+def get_archive():
+    """
+    Open the archive named by the SCRAPER_ARCHIVE environment variable.
+
+    Returns:
+        SnapshotArchive: The archive, or None when archiving is off
+    """
+    directory = os.environ.get(ARCHIVE_ENV_VAR)
+    if not directory:
+        return None
+    print(f"Archiving report pages to '{directory}'")
+    return SnapshotArchive(directory)
+
+
+def extract_table_cells(html, table_id):
+    """
+    Get the cell strings of a report table from saved page HTML.
+
+    Mirrors get_data(): rows of the first tbody (or the table itself when it
+    has none) and every td in each row, with whitespace collapsed like the
+    browser's rendered text.
+
+    Args:
+        html: Page source
+        table_id: id attribute of the table
+
+    Returns:
+        list: One list of cell strings per row (empty if the table is missing)
+    """
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer(id=table_id))
+    table = soup.find(id=table_id)
+    if table is None:
+        return []
+    body = table.find('tbody') or table
+    return [
+        [' '.join(cell.get_text(' ').split()) for cell in row.find_all('td')]
+        for row in body.find_all('tr')
+    ]
+
+
+def parse_snapshot(directory, record):
+    """
+    Rebuild the rows get_data() would have returned for one archived page.
+
+    Args:
+        directory: Archive directory
+        record: Manifest record
+
+    Returns:
+        list: List of dictionaries containing row data
+    """
+    # Imported here because the scrapers import this module
+    import enrollment_scraper
+    import graduation_rate_scraper
+
+    html = SnapshotArchive(directory).load(record['sha256'])
+    data = []
+    for texts in extract_table_cells(html, TABLE_IDS[record['report']]):
+        if record['report'] == 'enrollment':
+            result = enrollment_scraper.parse_row(texts, record['subgroup'], record['year'], record['attend_range'])
+        else:
+            result = graduation_rate_scraper.parse_row(texts, record['subgroup'])
+        if result:
+            data.append(result)
+    return data
+
+
+def get_scrape_order(record):
+    """
+    Sort key that puts records in the order the scrapers visit them.
+    """
+    import enrollment_scraper
+    import graduation_rate_scraper
+
+    if record['report'] == 'enrollment':
+        ranges = list(enrollment_scraper.ATTEND_RANGE_DROPDOWN_VALUES)
+        subgroups = list(enrollment_scraper.SUBGROUP_DROPDOWN_VALUES)
+        attend_range = ranges.index(record['attend_range']) if record['attend_range'] in ranges else len(ranges)
+    else:
+        subgroups = list(graduation_rate_scraper.DROPDOWN_VALUES)
+        attend_range = 0
+    subgroup = subgroups.index(record['subgroup']) if record['subgroup'] in subgroups else len(subgroups)
+    return attend_range, subgroup
+
+
+def get_output_filename(record):
+    """
+    Get the standard output filename for a manifest record.
+    """
+    import enrollment_scraper
+    import graduation_rate_scraper
+
+    if record['report'] == 'enrollment':
+        return enrollment_scraper.get_output_filename(record['data_type'], record['year'])
+    return graduation_rate_scraper.get_output_filename(record['data_type'])
+
+
+def reparse(directory, output_dir='.', max_workers=None):
+    """
+    Rebuild every CSV output from the archive, without a browser or network.
+
+    Outputs are saved in the SCRAPER_OUTPUT format (see save_output()).
+
+    Args:
+        directory: Archive directory
+        output_dir: Directory to write the CSVs to
+        max_workers: Number of worker processes (default: one per CPU)
+
+    Returns:
+        list: Paths of the files written
+    """
+    archive = SnapshotArchive(directory)
+    records = archive.read_manifest()
+    if not records:
+        print(f"No snapshots found in '{directory}'")
+        return []
+
+    groups = {}
+    for record in records:
+        groups.setdefault(get_output_filename(record), []).append(record)
+    for filename in groups:
+        groups[filename].sort(key=get_scrape_order)
+
+    ordered = [record for filename in groups for record in groups[filename]]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(parse_snapshot, [directory] * len(ordered), ordered, chunksize=4))
+
+    rows_by_record = {id(record): rows for record, rows in zip(ordered, results)}
+    written = []
+    for filename, group in groups.items():
+        final_data = []
+        for record in group:
+            rows = rows_by_record[id(record)]
+            if not rows:
+                print(f"Warning: No rows in snapshot for {record['report']} {record['data_type']} "
+                      f"{record['year']} {record['attend_range']} {record['subgroup']}".replace('  ', ' '))
+            final_data.extend(rows)
+        if not final_data:
+            continue
+        paths = save_output(pd.DataFrame(final_data), os.path.join(output_dir, filename))
+        written.extend(paths)
+        print(f"✓ Data saved to {', '.join(repr(path) for path in paths)} ({len(final_data)} rows from {len(group)} snapshots)")
+    return written
+
+
+def main():
+    """
+    Command-line entry point for the snapshot archive.
+    """
+    if len(sys.argv) < 3 or sys.argv[1] not in ['reparse', 'stats']:
+        print("Usage: python snapshot_archive.py <command> <archive_dir> [output_dir]")
+        print("  reparse <archive_dir> [output_dir]   rebuild the CSV outputs from archived pages")
+        print("  stats <archive_dir>                  show archive size and deduplication")
+        sys.exit(1)
+
+    command, directory = sys.argv[1], sys.argv[2]
+
+    if command == 'reparse':
+        output_dir = sys.argv[3] if len(sys.argv) > 3 else '.'
+        start = time.perf_counter()
+        written = reparse(directory, output_dir)
+        print(f"\nRebuilt {len(written)} files in {time.perf_counter() - start:.2f}s")
+    else:
+        archive = SnapshotArchive(directory)
+        records = archive.read_manifest()
+        digests = {record['sha256'] for record in records}
+        raw_bytes = sum(record['bytes'] for record in records)
+        stored_bytes = sum(os.path.getsize(archive.object_path(digest)) for digest in digests)
+        print(f"Form states: {len(records)}")
+        print(f"Unique pages: {len(digests)}")
+        print(f"Raw size: {raw_bytes / 1e6:.1f} MB")
+        print(f"Stored size: {stored_bytes / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import os
+
+
+EXTRACTION_ENV_VAR = 'SCRAPER_EXTRACTION'
+EXTRACTION_MODES = ['elements', 'script']
+
+# Mirrors the Selenium lookups in get_data(): rows of the first tbody (or of
+# the table when there is none) and every td inside each row.
+TABLE_CELLS_SCRIPT = """
+const table = document.getElementById(arguments[0]);
+if (!table) {
+    return null;
+}
+const body = table.querySelector('tbody') || table;
+return Array.from(body.querySelectorAll('tr'), row =>
+    Array.from(row.querySelectorAll('td'), cell => (cell.innerText || '').trim())
+);
+"""
+
+
+def get_table_cells(driver, table_id):
+    """
+    Read a whole table in one execute_script round-trip.
+
+    Args:
+        driver: Selenium WebDriver instance
+        table_id: id attribute of the table
+
+    Returns:
+        list: One list of trimmed cell strings per row, or None if the table is missing
+    """
+    return driver.execute_script(TABLE_CELLS_SCRIPT, table_id)
+
+
+def get_extraction_mode():
+    """
+    Get the extraction mode from the SCRAPER_EXTRACTION environment variable.
+
+    Returns:
+        str: 'elements' (default, one WebDriver call per cell) or 'script'
+    """
+    mode = os.environ.get(EXTRACTION_ENV_VAR, 'elements').lower()
+    if mode not in EXTRACTION_MODES:
+        print(f"Warning: Unknown extraction mode '{mode}', using 'elements'")
+        return 'elements'
+    return mode
@@ -0,0 +1,504 @@
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+import pandas as pd
+from selenium import webdriver
+
+import enrollment_scraper
+import graduation_rate_scraper
+from table_script import get_extraction_mode
+from snapshot_archive import get_archive
+from adaptive_timeout import AdaptiveTimeout, HedgedRunner, hedging_enabled
+from browser_recycling import get_recycler
+from normalized_output import save_output
+
+
+REPORTS = {
+    'enrollment': enrollment_scraper,
+    'graduation': graduation_rate_scraper
+}
+
+DATA_TYPES = ['school', 'district']
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+# Pause between two report requests of one worker, to stay polite to the server
+REQUEST_DELAY = 2
+REQUEST_DELAY_ENV_VAR = 'SCRAPER_REQUEST_DELAY'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    year TEXT NOT NULL DEFAULT '',
+    attend_range TEXT NOT NULL DEFAULT '',
+    subgroup TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    rows_json TEXT,
+    error TEXT,
+    updated REAL,
+    UNIQUE (report, data_type, year, attend_range, subgroup)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+
+def connect(db_path):
+    """
+    Open the queue database, creating the schema if needed.
+
+    Args:
+        db_path: Path to the SQLite file (put it on a shared filesystem to use it from several hosts)
+
+    Returns:
+        sqlite3.Connection: Connection in autocommit mode
+    """
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def iter_jobs(reports=None, data_types=None):
+    """
+    Generate every (report, data_type, year, attend_range, subgroup) combination.
+
+    Jobs are yielded in the same order the scrapers visit them, so merging
+    by job id reproduces the row order of a single-process run.
+
+    Args:
+        reports: Reports to include (default: all)
+        data_types: Data types to include (default: school and district)
+
+    Yields:
+        tuple: (report, data_type, year, attend_range, subgroup)
+    """
+    for report in reports or REPORTS:
+        for data_type in data_types or DATA_TYPES:
+            if report == 'enrollment':
+                for year in enrollment_scraper.YEAR_DROPDOWN_VALUES.values():
+                    for attend_range in enrollment_scraper.ATTEND_RANGE_DROPDOWN_VALUES:
+                        for subgroup in enrollment_scraper.SUBGROUP_DROPDOWN_VALUES:
+                            yield report, data_type, year, attend_range, subgroup
+            else:
+                for subgroup in graduation_rate_scraper.DROPDOWN_VALUES:
+                    yield report, data_type, '', '', subgroup
+
+
+def enqueue(conn, reports=None, data_types=None, limit=None):
+    """
+    Add all jobs to the queue. Jobs that already exist are left untouched.
+
+    Args:
+        conn: Queue connection
+        reports: Reports to include (default: all)
+        data_types: Data types to include (default: school and district)
+        limit: Only enqueue the first this many jobs
+
+    Returns:
+        int: Number of new jobs
+    """
+    now = time.time()
+    cursor = conn.executemany(
+        "INSERT OR IGNORE INTO jobs (report, data_type, year, attend_range, subgroup, updated) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [job + (now,) for job in itertools.islice(iter_jobs(reports, data_types), limit)]
+    )
+    return cursor.rowcount
+
+
+def lease(conn, worker, state=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """
+    Atomically take the next pending job, or one whose lease has expired.
+
+    Jobs with the same form state as the worker's current page are handed
+    out first so the worker does not have to reload and reset the form.
+    An expired lease that already used up its attempts is marked failed
+    instead, so a job that keeps killing its worker is not retried forever.
+
+    Args:
+        conn: Queue connection
+        worker: Worker identifier stored with the lease
+        state: (report, data_type, year, attend_range) the worker's page is in
+        lease_seconds: How long the worker may hold the job before it is handed out again
+        max_attempts: Attempts after which an expired lease is not handed out again
+
+    Returns:
+        sqlite3.Row: The leased job, or None when nothing is available
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        expired = conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'lease expired on last attempt', "
+            "lease_expires = NULL, updated = ? "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, max_attempts)
+        ).rowcount
+        if expired:
+            print(f"  Marked {expired} jobs failed: their last lease expired")
+        job = conn.execute(
+            "SELECT * FROM jobs WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+            "ORDER BY (report = ? AND data_type = ? AND year = ? AND attend_range = ?) DESC, id LIMIT 1",
+            (now,) + tuple(state or ('', '', '', ''))
+        ).fetchone()
+        if job is None:
+            conn.execute("COMMIT")
+            return None
+        if job['status'] == 'leased':
+            print(f"  Lease on job {job['id']} held by {job['worker']} expired, re-queuing")
+        conn.execute(
+            "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, "
+            "attempts = attempts + 1, updated = ? WHERE id = ?",
+            (worker, now + lease_seconds, now, job['id'])
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return conn.execute("SELECT * FROM jobs WHERE id = ?", (job['id'],)).fetchone()
+
+
+def ack(conn, job_id, worker, rows):
+    """
+    Store a job's rows and mark it done. Ignored if the lease was lost to another worker.
+
+    Returns:
+        bool: True if the result was recorded
+    """
+    cursor = conn.execute(
+        "UPDATE jobs SET status = 'done', rows_json = ?, error = NULL, lease_expires = NULL, updated = ? "
+        "WHERE id = ? AND worker = ? AND status = 'leased'",
+        (json.dumps(rows), time.time(), job_id, worker)
+    )
+    return cursor.rowcount == 1
+
+
+def nack(conn, job_id, worker, error, max_attempts=MAX_ATTEMPTS):
+    """
+    Return a job to the queue after a failure, or mark it failed once it used up its attempts.
+    """
+    conn.execute(
+        "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+        "error = ?, lease_expires = NULL, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+        (max_attempts, error, time.time(), job_id, worker)
+    )
+
+
+def get_job_state(job):
+    """
+    Get the form state a job needs before its subgroup is selected.
+    """
+    return job['report'], job['data_type'], job['year'], job['attend_range']
+
+
+def prepare_page(driver, job, wait_timeout=30):
+    """
+    Load the report page and set the data type, year and attend range for a job.
+
+    Args:
+        driver: Selenium WebDriver instance
+        job: Leased job row
+        wait_timeout: Maximum time to wait for elements (seconds)
+    """
+    scraper = REPORTS[job['report']]
+    if job['report'] == 'enrollment':
+        scraper.load_page_state(driver, job['data_type'], job['year'], job['attend_range'], wait_timeout)
+    else:
+        scraper.load_page_state(driver, job['data_type'], wait_timeout)
+
+
+def get_request_delay(default=REQUEST_DELAY):
+    """
+    Get the pause between requests from the SCRAPER_REQUEST_DELAY environment variable.
+
+    Returns:
+        float: Seconds
+    """
+    return float(os.environ.get(REQUEST_DELAY_ENV_VAR, default))
+
+
+def is_session_alive(driver):
+    """
+    Check whether a WebDriver session still answers commands.
+    """
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def quit_driver(driver):
+    """
+    Quit a WebDriver, ignoring errors from a session that already died.
+    """
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"  Warning: Could not quit browser: {e}")
+
+
+def run_job(driver, job, extraction='elements', archive=None, wait_timeout=30, timeouts=None):
+    """
+    Scrape one leased job with the report's handle_subgroup().
+
+    timeouts, if given, is an AdaptiveTimeout fed with the table wait times.
+
+    Returns:
+        list: Row dictionaries (empty if nothing was extracted)
+    """
+    scraper = REPORTS[job['report']]
+    if job['report'] == 'enrollment':
+        return scraper.handle_subgroup(
+            driver, job['subgroup'], data_type=job['data_type'], year=job['year'],
+            attend_range=job['attend_range'], wait_timeout=wait_timeout, extraction=extraction, archive=archive,
+            timeouts=timeouts
+        )
+    return scraper.handle_subgroup(
+        driver, job['subgroup'], data_type=job['data_type'], wait_timeout=wait_timeout,
+        extraction=extraction, archive=archive, timeouts=timeouts
+    )
+
+
+def run_worker(db_path, max_jobs=None, lease_seconds=LEASE_SECONDS, idle_exit=True, hedge=None):
+    """
+    Lease, scrape and acknowledge jobs until the queue is drained.
+
+    Wait timeouts adapt to how long report tables took to appear so far (see
+    AdaptiveTimeout). With hedging, a job that runs longer than jobs usually
+    do is re-issued on a spare browser and the first result is kept. Without hedging, the browser
+    is restarted when it grows too large or slow (see BrowserRecycler).
+
+    Args:
+        db_path: Path to the queue database
+        max_jobs: Stop after this many jobs (default: no limit)
+        lease_seconds: Lease duration for each job
+        idle_exit: Exit when no job is available instead of polling
+        hedge: Hedge slow jobs on a spare browser (default: SCRAPER_HEDGE environment variable)
+
+    Returns:
+        tuple: (jobs done, jobs failed)
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    request_delay = get_request_delay()
+    extraction = get_extraction_mode()
+    archive = get_archive()
+    conn = connect(db_path)
+    timeouts = AdaptiveTimeout()
+    if hedge is None:
+        hedge = hedging_enabled()
+    hedger = None
+    if hedge:
+        print("Hedging slow jobs on a spare browser")
+        hedger = HedgedRunner(
+            webdriver.Chrome,
+            prepare_page,
+            lambda driver, job, wait_timeout: run_job(driver, job, extraction, archive, wait_timeout, timeouts),
+            get_job_state,
+            timeouts
+        )
+    recycler = get_recycler()
+    driver = None
+    state = None
+    done = 0
+    failed = 0
+
+    try:
+        while max_jobs is None or done + failed < max_jobs:
+            job = lease(conn, worker, state, lease_seconds)
+            if job is None:
+                if idle_exit:
+                    break
+                time.sleep(5)
+                continue
+
+            label = f"{job['report']} {job['data_type']} {job['year']} {job['attend_range']} {job['subgroup']}".replace('  ', ' ')
+            print(f"\n[{worker}] Job {job['id']}: {label} (attempt {job['attempts']})")
+
+            try:
+                if hedger:
+                    data = hedger.run(job)
+                else:
+                    reason = recycler.check(driver) if recycler and driver else None
+                    if reason:
+                        print(f"  Restarting browser: {reason}")
+                        # The page is prepared for the job below; recycle() keeps
+                        # the old browser if a new one cannot be started
+                        new_driver = recycler.recycle(driver, lambda new: None)
+                        if new_driver is not driver:
+                            driver = new_driver
+                            state = None
+                    if driver is None:
+                        driver = webdriver.Chrome()
+                        if recycler:
+                            # Measure the fresh browser's own baseline
+                            recycler.reset()
+                    if get_job_state(job) != state:
+                        prepare_page(driver, job)
+                        state = get_job_state(job)
+
+                    start = time.perf_counter()
+                    data = run_job(driver, job, extraction, archive, timeouts.current(), timeouts)
+                    if data and recycler:
+                        recycler.observe(time.perf_counter() - start)
+            except Exception as e:
+                # Start the next job in a fresh browser, in case this one crashed
+                state = None
+                if driver:
+                    quit_driver(driver)
+                    driver = None
+                nack(conn, job['id'], worker, str(e))
+                failed += 1
+                print(f"✗ Error processing job {job['id']}: {e}")
+                continue
+
+            if data:
+                if ack(conn, job['id'], worker, data):
+                    done += 1
+                    print(f"✓ Successfully extracted {len(data)} rows")
+                else:
+                    print(f"Warning: Lease on job {job['id']} was lost, result discarded")
+            else:
+                nack(conn, job['id'], worker, 'no data extracted')
+                failed += 1
+                print("✗ No data extracted")
+                if driver and not is_session_alive(driver):
+                    print("  Browser session is gone, starting a new one for the next job")
+                    quit_driver(driver)
+                    driver = None
+                    state = None
+
+            # Small delay between requests to avoid overwhelming the server
+            time.sleep(request_delay)
+    finally:
+        if driver:
+            print("\nClosing browser...")
+            driver.quit()
+        if hedger:
+            print(f"\nHedged {hedger.hedged} jobs, {hedger.hedge_wins} won by the spare browser")
+            print("Closing browsers...")
+            hedger.close()
+        conn.close()
+
+    return done, failed
+
+
+def get_status(conn):
+    """
+    Count jobs by report, data type and status.
+
+    Returns:
+        DataFrame: Job counts
+    """
+    return pd.read_sql_query(
+        "SELECT report, data_type, year, status, COUNT(*) AS jobs FROM jobs "
+        "GROUP BY report, data_type, year, status ORDER BY report, data_type, year, status",
+        conn
+    )
+
+
+def get_output_filename(report, data_type, year):
+    """
+    Get the standard output filename for a job group.
+    """
+    if report == 'enrollment':
+        return enrollment_scraper.get_output_filename(data_type, year)
+    return graduation_rate_scraper.get_output_filename(data_type)
+
+
+def merge_results(conn, directory='.', include_incomplete=False):
+    """
+    Write the rows of all finished jobs to the standard scraper output files.
+
+    A file is only written once none of its jobs are pending or leased, so a
+    half-finished run never overwrites a complete CSV.
+
+    Args:
+        conn: Queue connection
+        directory: Directory to write the CSVs to
+        include_incomplete: Also write files whose jobs are still in progress
+
+    Returns:
+        list: Paths of the files written
+    """
+    written = []
+    groups = conn.execute(
+        "SELECT report, data_type, year, COUNT(*) AS total, SUM(status = 'done') AS done, "
+        "SUM(status IN ('pending', 'leased')) AS active "
+        "FROM jobs GROUP BY report, data_type, year ORDER BY MIN(id)"
+    ).fetchall()
+
+    for group in groups:
+        if not group['done']:
+            continue
+        filename = os.path.join(directory, get_output_filename(group['report'], group['data_type'], group['year']))
+        if group['active'] and not include_incomplete:
+            print(f"Skipping {os.path.basename(filename)}: {group['active']} jobs still pending")
+            continue
+        if group['done'] < group['total']:
+            print(f"Warning: {os.path.basename(filename)} is incomplete ({group['done']}/{group['total']} jobs done)")
+
+        final_data = []
+        cursor = conn.execute(
+            "SELECT rows_json FROM jobs WHERE report = ? AND data_type = ? AND year = ? AND status = 'done' ORDER BY id",
+            (group['report'], group['data_type'], group['year'])
+        )
+        for (rows_json,) in cursor:
+            final_data.extend(json.loads(rows_json))
+
+        df = pd.DataFrame(final_data)
+        for path in save_output(df, filename):
+            written.append(path)
+            print(f"✓ Data saved to '{path}' ({len(df)} rows)")
+
+    return written
+
+
+def main():
+    """
+    Command-line entry point for the shared work queue.
+    """
+    usage = [
+        "Usage: python work_queue.py <command> <queue.db> [args]",
+        "  init <queue.db> [report] [data_type]   enqueue every job (report: 'enrollment' or 'graduation')",
+        "  worker <queue.db> [max_jobs]          lease and scrape jobs until the queue is empty",
+        "  status <queue.db>                     show job counts",
+        "  merge <queue.db> [directory] [--partial]   write finished jobs to the output CSVs"
+    ]
+    if len(sys.argv) < 3 or sys.argv[1] not in ['init', 'worker', 'status', 'merge']:
+        print('\n'.join(usage))
+        sys.exit(1)
+
+    command, db_path, args = sys.argv[1], sys.argv[2], sys.argv[3:]
+
+    if command == 'init':
+        reports = [arg for arg in args if arg in REPORTS] or None
+        data_types = [arg for arg in args if arg in DATA_TYPES] or None
+        conn = connect(db_path)
+        added = enqueue(conn, reports, data_types)
+        print(f"Enqueued {added} new jobs in '{db_path}'")
+        print(get_status(conn).to_string(index=False))
+    elif command == 'worker':
+        max_jobs = int(args[0]) if args else None
+        done, failed = run_worker(db_path, max_jobs)
+        print(f"\n{'='*60}")
+        print(f"Worker finished. Done: {done}, Failed attempts: {failed}")
+        print(f"{'='*60}")
+    elif command == 'status':
+        print(get_status(connect(db_path)).to_string(index=False))
+    else:
+        partial = '--partial' in args
+        args = [arg for arg in args if arg != '--partial']
+        merge_results(connect(db_path), args[0] if args else '.', include_incomplete=partial)
+
+
+if __name__ == '__main__':
+    main()